@@ -0,0 +1,160 @@
+"""
+Deterministic financial engine for the Battery Sizing agent.
+Computes every numeric field of BatterySizingOutput with NumPy, in one pass over any
+number of facilities, using the same rules as BATTERY_SIZING_SYSTEM_PROMPT.
+The LLM only writes the rationale and confidence.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+MODULE_INSTALLED_COST_USD = 187_500
+IRA_ITC_RATE = 0.30
+DISCOUNT_RATE = 0.08
+NPV_YEARS = 5
+UPGRADE_DIESEL_COST_USD = 180_000
+UPGRADE_DIESEL_AMORTIZATION_YEARS = 10
+UPGRADE_DIESEL_FUEL_EFFICIENCY_GAIN = 0.15
+GENERATOR_LOAD_FACTOR = 0.6
+DIESEL_CO2_T_PER_KWH = 0.000293
+LBS_PER_METRIC_TON = 2204.6
+HOURS_PER_YEAR = 8760
+# Payback reported when the battery scenario saves nothing (field must stay finite and >= 0)
+PAYBACK_CAP_YEARS = 99.0
+
+# Sum of 1 / (1 + r)^year for years 1..N
+_ANNUITY_FACTOR = float(np.sum(1.0 / (1.0 + DISCOUNT_RATE) ** np.arange(1, NPV_YEARS + 1)))
+
+NUMERIC_FIELDS = (
+    "scenario_continue_as_is_annual_cost_usd",
+    "scenario_upgrade_diesel_annual_cost_usd",
+    "scenario_add_battery_annual_cost_usd",
+    "gross_capex_usd",
+    "ira_credit_amount_usd",
+    "ira_adjusted_capex_usd",
+    "payback_years",
+    "npv_5yr_usd",
+    "annual_demand_charge_savings_usd",
+    "annual_diesel_cost_eliminated_usd",
+    "co2_avoided_metric_tons_per_year",
+)
+
+
+def _column(rows: Sequence[Dict[str, Any]], key: str) -> np.ndarray:
+    return np.fromiter(((row.get(key) or 0) for row in rows), dtype=np.float64, count=len(rows))
+
+
+def compute_battery_sizing_arrays(
+    facility_power_load_kw: np.ndarray,
+    annual_diesel_runtime_hours: np.ndarray,
+    annual_diesel_fuel_cost: np.ndarray,
+    monthly_demand_charge_usd: np.ndarray,
+    grid_electricity_rate_kwh: np.ndarray,
+    grid_carbon_intensity_lbs_kwh: np.ndarray,
+    diesel_runtime_reduction_hrs: np.ndarray,
+    peak_events_addressable_pct: np.ndarray,
+    recommended_module_count: np.ndarray,
+    recommended_kwh_total: np.ndarray,
+    ira_credit_flag: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """Columnar core. Every argument is a 1-D array with one entry per facility."""
+    peak_pct = np.clip(peak_events_addressable_pct, 0.0, 1.0)
+    runtime = np.maximum(annual_diesel_runtime_hours, 0.0)
+    runtime_reduction = np.minimum(np.maximum(diesel_runtime_reduction_hrs, 0.0), runtime)
+    diesel_fraction_eliminated = np.divide(
+        runtime_reduction, runtime, out=np.zeros_like(runtime), where=runtime > 0
+    )
+
+    annual_demand_charges = monthly_demand_charge_usd * 12.0
+    grid_kwh = facility_power_load_kw * np.maximum(HOURS_PER_YEAR - runtime, 0.0)
+    annual_grid_cost = grid_kwh * grid_electricity_rate_kwh
+
+    continue_as_is = annual_diesel_fuel_cost + annual_demand_charges + annual_grid_cost
+    upgrade_diesel = (
+        annual_diesel_fuel_cost * (1.0 - UPGRADE_DIESEL_FUEL_EFFICIENCY_GAIN)
+        + annual_demand_charges
+        + annual_grid_cost
+        + UPGRADE_DIESEL_COST_USD / UPGRADE_DIESEL_AMORTIZATION_YEARS
+    )
+    demand_savings = annual_demand_charges * peak_pct
+    diesel_eliminated = annual_diesel_fuel_cost * diesel_fraction_eliminated
+    add_battery = continue_as_is - demand_savings - diesel_eliminated
+
+    gross_capex = recommended_module_count * MODULE_INSTALLED_COST_USD
+    ira_credit = np.where(ira_credit_flag, gross_capex * IRA_ITC_RATE, 0.0)
+    net_capex = gross_capex - ira_credit
+
+    annual_savings = continue_as_is - add_battery
+    npv = annual_savings * _ANNUITY_FACTOR - net_capex
+    payback = np.divide(
+        net_capex,
+        annual_savings,
+        out=np.full_like(net_capex, PAYBACK_CAP_YEARS),
+        where=annual_savings > 0,
+    )
+    payback = np.minimum(payback, PAYBACK_CAP_YEARS)
+
+    # Diesel: displaced generator kWh. Grid: one full peak-shaving discharge per addressable
+    # monthly peak event, at the facility's grid carbon intensity.
+    diesel_kwh_displaced = runtime_reduction * facility_power_load_kw * GENERATOR_LOAD_FACTOR
+    peak_kwh_shaved = recommended_kwh_total * peak_pct * 12.0
+    co2_avoided = (
+        diesel_kwh_displaced * DIESEL_CO2_T_PER_KWH
+        + peak_kwh_shaved * grid_carbon_intensity_lbs_kwh / LBS_PER_METRIC_TON
+    )
+
+    return {
+        "scenario_continue_as_is_annual_cost_usd": np.rint(continue_as_is),
+        "scenario_upgrade_diesel_annual_cost_usd": np.rint(upgrade_diesel),
+        "scenario_add_battery_annual_cost_usd": np.rint(add_battery),
+        "gross_capex_usd": np.rint(gross_capex),
+        "ira_credit_amount_usd": np.rint(ira_credit),
+        "ira_adjusted_capex_usd": np.rint(net_capex),
+        "payback_years": np.round(payback, 2),
+        "npv_5yr_usd": np.rint(npv),
+        "annual_demand_charge_savings_usd": np.rint(demand_savings),
+        "annual_diesel_cost_eliminated_usd": np.rint(diesel_eliminated),
+        "co2_avoided_metric_tons_per_year": np.round(co2_avoided, 2),
+    }
+
+
+def compute_battery_sizing_batch(
+    profiles: Sequence[Dict[str, Any]],
+    energy_load_outputs: Sequence[Dict[str, Any]],
+    ira_credit_flags: Optional[Sequence[bool]] = None,
+) -> List[Dict[str, Any]]:
+    """Compute the numeric BatterySizingOutput fields for many facilities at once.
+    ira_credit_flags defaults to each profile's ira_eligible."""
+    if len(profiles) != len(energy_load_outputs):
+        raise ValueError("profiles and energy_load_outputs must have the same length")
+    if ira_credit_flags is None:
+        ira_credit_flags = [bool(p.get("ira_eligible", False)) for p in profiles]
+
+    arrays = compute_battery_sizing_arrays(
+        facility_power_load_kw=_column(profiles, "facility_power_load_kw"),
+        annual_diesel_runtime_hours=_column(profiles, "annual_diesel_runtime_hours"),
+        annual_diesel_fuel_cost=_column(profiles, "annual_diesel_fuel_cost"),
+        monthly_demand_charge_usd=_column(profiles, "monthly_demand_charge_usd"),
+        grid_electricity_rate_kwh=_column(profiles, "grid_electricity_rate_kwh"),
+        grid_carbon_intensity_lbs_kwh=_column(profiles, "grid_carbon_intensity_lbs_kwh"),
+        diesel_runtime_reduction_hrs=_column(energy_load_outputs, "diesel_runtime_reduction_hrs"),
+        peak_events_addressable_pct=_column(energy_load_outputs, "peak_events_addressable_pct"),
+        recommended_module_count=_column(energy_load_outputs, "recommended_module_count"),
+        recommended_kwh_total=_column(energy_load_outputs, "recommended_kwh_total"),
+        ira_credit_flag=np.fromiter((bool(f) for f in ira_credit_flags), dtype=bool, count=len(profiles)),
+    )
+
+    float_fields = {"payback_years", "co2_avoided_metric_tons_per_year"}
+    columns = {
+        name: values.tolist() if name in float_fields else values.astype(np.int64).tolist()
+        for name, values in arrays.items()
+    }
+    return [dict(zip(NUMERIC_FIELDS, row)) for row in zip(*(columns[name] for name in NUMERIC_FIELDS))]
+
+
+def compute_battery_sizing(
+    profile: Dict[str, Any],
+    energy_load_output: Dict[str, Any],
+    ira_credit_flag: bool,
+) -> Dict[str, Any]:
+    return compute_battery_sizing_batch([profile], [energy_load_output], [ira_credit_flag])[0]
@@ -0,0 +1,136 @@
+"""
+Checkpoint garbage collection. Threads are only needed while a run can still be resumed; once the
+run's proposal is in a terminal status and the thread has been idle for CHECKPOINT_GC_TTL_DAYS,
+every version, pending write and blob is bulk-deleted and replaced by one compact record in
+checkpoint_archive/{thread_id} (run_id, facility_id, status and the final state, msgpack+zstd).
+
+Threads whose run never reached a terminal status are kept for CHECKPOINT_GC_ABANDONED_DAYS so
+they stay resumable. Threads with no proposal (e.g. /test-graph, or a run that died before the
+orchestrator recorded it) and leftovers from the pre-delta layout follow the terminal TTL.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from firestore_tools import proposal_get_many
+
+CHECKPOINT_GC_ENABLED = os.getenv("CHECKPOINT_GC_ENABLED", "true").lower() in ("true", "1", "yes")
+CHECKPOINT_GC_TTL_DAYS = float(os.getenv("CHECKPOINT_GC_TTL_DAYS", "7"))
+CHECKPOINT_GC_ABANDONED_DAYS = float(os.getenv("CHECKPOINT_GC_ABANDONED_DAYS", "30"))
+CHECKPOINT_GC_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_GC_INTERVAL_SECONDS", "3600"))
+CHECKPOINT_GC_PAGE_SIZE = int(os.getenv("CHECKPOINT_GC_PAGE_SIZE", "100"))
+
+TERMINAL_STATUSES = ("approved", "rejected", "failed", "pending_review", "cancelled")
+
+
+class CheckpointGC:
+    """Compacts idle threads of a CheckpointRouter's Firestore tier (and drops them from its local tier)."""
+
+    def __init__(
+        self,
+        router,
+        ttl_days: float = CHECKPOINT_GC_TTL_DAYS,
+        abandoned_days: float = CHECKPOINT_GC_ABANDONED_DAYS,
+        page_size: int = CHECKPOINT_GC_PAGE_SIZE,
+    ):
+        self.router = router
+        self.ttl_days = ttl_days
+        self.abandoned_days = abandoned_days
+        self.page_size = page_size
+        # One pass at a time: the background loop and POST /checkpoints/gc share this instance
+        self._lock = threading.Lock()
+        self.passes = 0
+        self.threads_compacted = 0
+        self.docs_deleted = 0
+        self.bytes_reclaimed = 0
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def _collectable(self, proposal: Optional[Dict[str, Any]], updated_at, abandoned_before) -> bool:
+        if proposal is None or proposal.get("status") in TERMINAL_STATUSES:
+            return True
+        return updated_at is not None and updated_at < abandoned_before
+
+    def run_pass(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Scan every thread idle past the TTL. dry_run reports what would be reclaimed."""
+        with self._lock:
+            return self._run_pass(dry_run)
+
+    def _run_pass(self, dry_run: bool) -> Dict[str, Any]:
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+        abandoned_before = now - timedelta(days=self.abandoned_days)
+        remote = self.router.remote
+        report = {
+            "dry_run": dry_run,
+            "threads_scanned": 0,
+            "threads_compacted": 0,
+            "threads_kept": 0,
+            "docs_deleted": 0,
+            "bytes_reclaimed": 0,
+        }
+        cursor = None
+        while True:
+            page = remote.stale_threads(now - timedelta(days=self.ttl_days), self.page_size, cursor)
+            if not page:
+                break
+            cursor = page[-1]
+            states = {}
+            for snap in page:
+                if snap.id.endswith("_writes") and "writes" in (snap.to_dict() or {}):
+                    # Pre-delta write log; nothing can read it any more
+                    states[snap.id] = None
+                else:
+                    states[snap.id] = remote.thread_state(snap) or {}
+            proposals = proposal_get_many([s["run_id"] for s in states.values() if s and s.get("run_id")])
+
+            for snap in page:
+                report["threads_scanned"] += 1
+                state = states[snap.id]
+                run_id = (state or {}).get("run_id")
+                proposal = proposals.get(run_id) if run_id else None
+                if not self._collectable(proposal, (snap.to_dict() or {}).get("updated_at"), abandoned_before):
+                    report["threads_kept"] += 1
+                    continue
+                record = None
+                if state is not None:
+                    record = {
+                        "run_id": run_id,
+                        "facility_id": state.get("facility_id"),
+                        "status": (proposal or {}).get("status", state.get("status")),
+                    }
+                docs, reclaimed = remote.compact_thread(snap, record, state, dry_run)
+                if not dry_run:
+                    self.router.local.delete_thread(snap.id)
+                report["threads_compacted"] += 1
+                report["docs_deleted"] += docs
+                report["bytes_reclaimed"] += reclaimed
+
+            if len(page) < self.page_size:
+                break
+
+        report["elapsed_seconds"] = round(time.monotonic() - started, 2)
+        self.passes += 1
+        if not dry_run:
+            self.threads_compacted += report["threads_compacted"]
+            self.docs_deleted += report["docs_deleted"]
+            self.bytes_reclaimed += report["bytes_reclaimed"]
+        self.last_report = report
+        print(
+            f"Checkpoint GC{' (dry run)' if dry_run else ''}: compacted {report['threads_compacted']}"
+            f"/{report['threads_scanned']} threads, {report['docs_deleted']} docs, "
+            f"{report['bytes_reclaimed']} bytes"
+        )
+        return report
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": CHECKPOINT_GC_ENABLED,
+            "ttl_days": self.ttl_days,
+            "passes": self.passes,
+            "threads_compacted": self.threads_compacted,
+            "docs_deleted": self.docs_deleted,
+            "bytes_reclaimed": self.bytes_reclaimed,
+            "last_report": self.last_report,
+        }
@@ -0,0 +1,451 @@
+"""
+Checkpoint durability modes, chosen per run through the graph config:
+
+    config={"configurable": {"thread_id": run_id, "checkpoint_mode": "replicated"}}
+
+    none        no checkpoints (fast one-shot runs, e.g. batch evaluations)
+    local       in-process tier: in-memory, or sqlite (WAL) when CHECKPOINT_LOCAL_PATH is set;
+                keeps the CHECKPOINT_LOCAL_MAX_THREADS most recently written threads
+    replicated  local tier, copied to Firestore in the background (reads fall back to Firestore)
+    firestore   synchronous Firestore writes (FirestoreCheckpointer)
+
+CHECKPOINT_MODE sets the default when a run doesn't pick one.
+"""
+import copy
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from checkpointer import FirestoreCheckpointer, _decode, _encode, _thread_config
+from tracing import tracer
+
+CHECKPOINT_MODES = ("none", "local", "replicated", "firestore")
+CHECKPOINT_MODE = os.getenv("CHECKPOINT_MODE", "firestore").lower()
+CHECKPOINT_LOCAL_PATH = os.getenv("CHECKPOINT_LOCAL_PATH", "")
+# The checkpoint GC only walks Firestore, so the local tier bounds itself: past this many threads
+# the least recently written are dropped (0 keeps all). A dropped local-mode thread can't be
+# resumed; a replicated one falls back to its Firestore copy.
+CHECKPOINT_LOCAL_MAX_THREADS = int(os.getenv("CHECKPOINT_LOCAL_MAX_THREADS", "1000"))
+# The sqlite tier checks its thread count every this many checkpoint puts
+_SQLITE_EVICT_EVERY_PUTS = 50
+CHECKPOINT_REPLICATION_MAX_RETRIES = int(os.getenv("CHECKPOINT_REPLICATION_MAX_RETRIES", "3"))
+
+if CHECKPOINT_MODE not in CHECKPOINT_MODES:
+    raise ValueError(f"CHECKPOINT_MODE must be one of {CHECKPOINT_MODES}, got {CHECKPOINT_MODE!r}")
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """InMemorySaver that keeps only the max_threads most recently written threads."""
+
+    def __init__(self, max_threads: int = CHECKPOINT_LOCAL_MAX_THREADS):
+        super().__init__()
+        self.max_threads = max_threads
+        self.evicted = 0
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._recent_lock = threading.Lock()
+
+    def _touch(self, thread_id: str) -> None:
+        with self._recent_lock:
+            self._recent[thread_id] = None
+            self._recent.move_to_end(thread_id)
+            evict = []
+            while self.max_threads > 0 and len(self._recent) > self.max_threads:
+                evict.append(self._recent.popitem(last=False)[0])
+        for old in evict:
+            super().delete_thread(old)
+            self.evicted += 1
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        next_config = super().put(config, checkpoint, metadata, new_versions)
+        self._touch(config["configurable"]["thread_id"])
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        super().put_writes(config, writes, task_id, task_path)
+        self._touch(config["configurable"]["thread_id"])
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._recent_lock:
+            self._recent.pop(thread_id, None)
+        super().delete_thread(thread_id)
+
+
+class SqliteCheckpointer(BaseCheckpointSaver):
+    """Full checkpoints in a local sqlite file (WAL), msgpack+zstd like FirestoreCheckpointer.
+    Local writes take well under a millisecond, so the async methods call straight through.
+    Threads past max_threads are dropped oldest first; checkpoint ids sort by time."""
+
+    def __init__(self, path: str, max_threads: int = CHECKPOINT_LOCAL_MAX_THREADS):
+        super().__init__()
+        self.max_threads = max_threads
+        self.evicted = 0
+        self._puts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+                    parent_checkpoint_id TEXT, type TEXT, codec TEXT, checkpoint BLOB,
+                    metadata_type TEXT, metadata BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))"""
+            )
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS writes (
+                    thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,
+                    task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT, type TEXT, codec TEXT,
+                    value BLOB, task_path TEXT,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"""
+            )
+            self._conn.commit()
+
+    def _row_to_tuple(self, row) -> CheckpointTuple:
+        thread_id, ns, checkpoint_id, parent_id, type_, codec, blob, meta_type, meta = row
+        with self._lock:
+            writes = self._conn.execute(
+                "SELECT task_id, channel, type, codec, value FROM writes "
+                "WHERE thread_id=? AND checkpoint_ns=? AND checkpoint_id=? ORDER BY task_path, task_id, idx",
+                (thread_id, ns, checkpoint_id),
+            ).fetchall()
+        return CheckpointTuple(
+            config=_thread_config(thread_id, ns, checkpoint_id),
+            checkpoint=self.serde.loads_typed((type_, _decode(codec, blob))),
+            metadata=self.serde.loads_typed((meta_type, meta)),
+            parent_config=_thread_config(thread_id, ns, parent_id) if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((w_type, _decode(w_codec, value))))
+                for task_id, channel, w_type, w_codec, value in writes
+            ],
+        )
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        conf = config["configurable"]
+        thread_id, ns = conf["thread_id"], conf.get("checkpoint_ns", "")
+        type_, data = self.serde.dumps_typed(checkpoint)
+        codec, blob = _encode(data)
+        meta_type, meta = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, ns, checkpoint["id"], conf.get("checkpoint_id"), type_, codec, blob, meta_type, meta),
+            )
+            self._conn.commit()
+            self._puts += 1
+            if self.max_threads > 0 and self._puts % _SQLITE_EVICT_EVERY_PUTS == 0:
+                self._evict()
+        return _thread_config(thread_id, ns, checkpoint["id"])
+
+    def _evict(self) -> None:
+        # Caller holds self._lock
+        old = [
+            row[0]
+            for row in self._conn.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id "
+                "ORDER BY MAX(checkpoint_id) DESC LIMIT -1 OFFSET ?",
+                (self.max_threads,),
+            )
+        ]
+        if not old:
+            return
+        marks = ",".join("?" * len(old))
+        self._conn.execute(f"DELETE FROM checkpoints WHERE thread_id IN ({marks})", old)
+        self._conn.execute(f"DELETE FROM writes WHERE thread_id IN ({marks})", old)
+        self._conn.commit()
+        self.evicted += len(old)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        conf = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, data = self.serde.dumps_typed(value)
+            codec, blob = _encode(data)
+            rows.append((
+                conf["thread_id"], conf.get("checkpoint_ns", ""), conf["checkpoint_id"],
+                task_id, WRITES_IDX_MAP.get(channel, idx), channel, type_, codec, blob, task_path,
+            ))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        conf = config["configurable"]
+        args = [conf["thread_id"], conf.get("checkpoint_ns", "")]
+        sql = "SELECT * FROM checkpoints WHERE thread_id=? AND checkpoint_ns=?"
+        if checkpoint_id := get_checkpoint_id(config):
+            sql += " AND checkpoint_id=?"
+            args.append(checkpoint_id)
+        sql += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            row = self._conn.execute(sql, args).fetchone()
+        return self._row_to_tuple(row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        sql, args = "SELECT * FROM checkpoints WHERE 1=1", []
+        if config is not None:
+            sql += " AND thread_id=? AND checkpoint_ns=?"
+            args += [config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", "")]
+            if checkpoint_id := get_checkpoint_id(config):
+                sql += " AND checkpoint_id=?"
+                args.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            sql += " AND checkpoint_id<?"
+            args.append(before_id)
+        sql += " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        remaining = limit
+        for row in rows:
+            if remaining is not None and remaining <= 0:
+                return
+            item = self._row_to_tuple(row)
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            yield item
+            if remaining is not None:
+                remaining -= 1
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id=?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id=?", (thread_id,))
+            self._conn.commit()
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self.delete_thread(thread_id)
+
+
+class FirestoreReplicator:
+    """Copies local checkpoint writes to Firestore in order, on one background thread, so the
+    graph never waits on the network. Failed copies are retried, then dropped and counted."""
+
+    def __init__(self, remote: FirestoreCheckpointer):
+        self.remote = remote
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.replicated = 0
+        self.failed = 0
+
+    def submit(self, method: str, *args) -> None:
+        # Snapshot now: the graph keeps going and may reuse these objects before the copy runs
+        args = copy.deepcopy(args)
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="checkpoint-replicator", daemon=True)
+                    self._thread.start()
+        self._queue.put((method, args))
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                method, args = item
+                for attempt in range(CHECKPOINT_REPLICATION_MAX_RETRIES + 1):
+                    try:
+                        getattr(self.remote, method)(*args)
+                        self.replicated += 1
+                        break
+                    except Exception as e:
+                        if attempt == CHECKPOINT_REPLICATION_MAX_RETRIES:
+                            self.failed += 1
+                            print(f"Checkpoint replication {method} failed for good: {e}")
+                        else:
+                            time.sleep(0.5 * (2 ** attempt))
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything submitted so far is in Firestore. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": self._queue.unfinished_tasks, "replicated": self.replicated, "failed": self.failed}
+
+
+class CheckpointRouter(BaseCheckpointSaver):
+    """The graph's checkpointer. Routes every call to the tier named by the run's
+    configurable.checkpoint_mode (default CHECKPOINT_MODE)."""
+
+    def __init__(self, default_mode: str = CHECKPOINT_MODE, local_path: str = CHECKPOINT_LOCAL_PATH):
+        super().__init__()
+        self.default_mode = default_mode
+        self.local: BaseCheckpointSaver = SqliteCheckpointer(local_path) if local_path else BoundedMemorySaver()
+        self._remote: Optional[FirestoreCheckpointer] = None
+        self._replicator: Optional[FirestoreReplicator] = None
+
+    @property
+    def remote(self) -> FirestoreCheckpointer:
+        # Built on first use, so runs that never touch Firestore don't need it configured
+        if self._remote is None:
+            self._remote = FirestoreCheckpointer()
+        return self._remote
+
+    @property
+    def replicator(self) -> FirestoreReplicator:
+        if self._replicator is None:
+            self._replicator = FirestoreReplicator(self.remote)
+        return self._replicator
+
+    def mode(self, config) -> str:
+        mode = (config or {}).get("configurable", {}).get("checkpoint_mode") or self.default_mode
+        if mode not in CHECKPOINT_MODES:
+            raise ValueError(f"checkpoint_mode must be one of {CHECKPOINT_MODES}, got {mode!r}")
+        return mode
+
+    # -- writes -------------------------------------------------------------
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        mode = self.mode(config)
+        if mode == "none":
+            conf = config["configurable"]
+            return _thread_config(conf["thread_id"], conf.get("checkpoint_ns", ""), checkpoint["id"])
+        if mode == "firestore":
+            return self.remote.put(config, checkpoint, metadata, new_versions)
+        next_config = self.local.put(config, checkpoint, metadata, new_versions)
+        if mode == "replicated":
+            self.replicator.submit("put", config, checkpoint, metadata, new_versions)
+        return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        mode = self.mode(config)
+        if mode == "none":
+            return
+        if mode == "firestore":
+            return self.remote.put_writes(config, writes, task_id, task_path)
+        self.local.put_writes(config, writes, task_id, task_path)
+        if mode == "replicated":
+            self.replicator.submit("put_writes", config, writes, task_id, task_path)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        mode = self.mode(config)
+        if mode == "none":
+            return self.put(config, checkpoint, metadata, new_versions)
+        with tracer.start_as_current_span("checkpoint.put", attributes={"checkpoint.mode": mode}):
+            if mode == "firestore":
+                return await self.remote.aput(config, checkpoint, metadata, new_versions)
+            next_config = await self.local.aput(config, checkpoint, metadata, new_versions)
+            if mode == "replicated":
+                self.replicator.submit("put", config, checkpoint, metadata, new_versions)
+            return next_config
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        mode = self.mode(config)
+        if mode == "none":
+            return
+        with tracer.start_as_current_span(
+            "checkpoint.put_writes", attributes={"checkpoint.mode": mode, "checkpoint.writes": len(writes)}
+        ):
+            if mode == "firestore":
+                return await self.remote.aput_writes(config, writes, task_id, task_path)
+            await self.local.aput_writes(config, writes, task_id, task_path)
+            if mode == "replicated":
+                self.replicator.submit("put_writes", config, writes, task_id, task_path)
+
+    # -- reads --------------------------------------------------------------
+
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        mode = self.mode(config)
+        if mode == "none":
+            return None
+        if mode == "firestore":
+            return self.remote.get_tuple(config)
+        found = self.local.get_tuple(config)
+        if found is None and mode == "replicated":
+            # Local tier lost (restart): the replica is the recovery copy
+            found = self.remote.get_tuple(config)
+        return found
+
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        mode = self.mode(config)
+        if mode == "none":
+            return None
+        with tracer.start_as_current_span("checkpoint.get", attributes={"checkpoint.mode": mode}):
+            if mode == "firestore":
+                return await self.remote.aget_tuple(config)
+            found = await self.local.aget_tuple(config)
+            if found is None and mode == "replicated":
+                found = await self.remote.aget_tuple(config)
+            return found
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        mode = self.mode(config)
+        if mode == "none":
+            return
+        saver = self.remote if mode == "firestore" else self.local
+        yielded = False
+        for item in saver.list(config, filter=filter, before=before, limit=limit):
+            yielded = True
+            yield item
+        if not yielded and mode == "replicated":
+            yield from self.remote.list(config, filter=filter, before=before, limit=limit)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        mode = self.mode(config)
+        if mode == "none":
+            return
+        saver = self.remote if mode == "firestore" else self.local
+        yielded = False
+        async for item in saver.alist(config, filter=filter, before=before, limit=limit):
+            yielded = True
+            yield item
+        if not yielded and mode == "replicated":
+            async for item in self.remote.alist(config, filter=filter, before=before, limit=limit):
+                yield item
+
+    def delete_thread(self, thread_id: str) -> None:
+        # The thread may have run under any mode
+        self.local.delete_thread(thread_id)
+        self.remote.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.local.adelete_thread(thread_id)
+        await self.remote.adelete_thread(thread_id)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Shutdown: give pending replication a chance to land."""
+        if self._replicator is not None and not self._replicator.flush(timeout):
+            print(f"Checkpoint replication still pending at shutdown: {self._replicator.stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default_mode": self.default_mode,
+            "local": type(self.local).__name__,
+            "local_evicted": self.local.evicted,
+            "replication": self._replicator.stats() if self._replicator is not None else None,
+        }
@@ -1,81 +1,531 @@
-import asyncio
+"""
+LangGraph checkpointer on Firestore.
+
+Layout (one doc per checkpoint, history kept):
+    checkpoints/{thread_id}                                       thread summary (latest id, step)
+    checkpoints/{thread_id}/checkpoint_versions/{version_id}      one checkpoint + parent id
+    checkpoints/{thread_id}/checkpoint_blobs/{blob_id}            one channel value, content-addressed
+    .../checkpoint_versions/{version_id}/checkpoint_writes/{task_id}#{idx}   pending writes, per task
+
+Checkpoints are stored as deltas: a version doc holds the checkpoint without its channel values
+plus a {channel: blob_id} map. Only channels in new_versions whose bytes actually changed get a
+new blob; the rest point at the parent's. Reads fetch the referenced blobs in one batched get,
+skipping any already in the process-local blob cache.
+
+Checkpoints and write values are serialized with the saver's serde (msgpack) and compressed with zstd.
+
+Finished threads are compacted by checkpoint_gc.py into one checkpoint_archive/{thread_id} record.
+"""
+import hashlib
 import json
-from typing import Optional, Iterator, AsyncIterator
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import firebase_admin
-from firebase_admin import firestore
-from langgraph.checkpoint.base import BaseCheckpointSaver, CheckpointTuple
+import zstandard
+from firebase_admin import firestore, firestore_async
+from google.cloud.firestore import FieldFilter
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+VERSIONS = "checkpoint_versions"
+WRITES = "checkpoint_writes"
+BLOBS = "checkpoint_blobs"
+ARCHIVE = "checkpoint_archive"
+# Firestore's per-batch write limit
+MAX_BATCH_DELETES = 500
+CHECKPOINT_CACHE_MAX_BLOBS = int(os.getenv("CHECKPOINT_CACHE_MAX_BLOBS", "4096"))
+CHECKPOINT_CACHE_MAX_VERSIONS = int(os.getenv("CHECKPOINT_CACHE_MAX_VERSIONS", "1024"))
+ZSTD_LEVEL = 3
+# Blobs this small don't shrink enough to be worth compressing
+ZSTD_MIN_BYTES = 256
+
+
+def _encode(data: bytes) -> Tuple[str, bytes]:
+    if len(data) < ZSTD_MIN_BYTES:
+        return "raw", data
+    return "zstd", zstandard.compress(data, ZSTD_LEVEL)
+
+
+def _decode(codec: str, data: bytes) -> bytes:
+    return zstandard.decompress(data) if codec == "zstd" else data
+
+
+def _blob_id(checkpoint_ns: str, channel: str, type_: str, data: bytes) -> str:
+    h = hashlib.sha256()
+    for part in (checkpoint_ns.encode(), channel.encode(), type_.encode(), data):
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()[:40]
+
+
+def _stored_size(value: Any) -> int:
+    """Firestore's storage size for a field value (bool before int: bool is an int subclass)."""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return len(value.encode()) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(k.encode()) + 1 + _stored_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_stored_size(v) for v in value)
+    # numbers, timestamps, references
+    return 8
+
+
+def _doc_size(snap) -> int:
+    """Approximate stored size of a document: name + fields + 32 bytes overhead."""
+    name = sum(len(part.encode()) + 1 for part in snap.reference.path.split("/")) + 16
+    return name + _stored_size(snap.to_dict() or {}) + 32
+
+
+class _LRU:
+    """Small thread-safe LRU (sync methods may run on worker threads)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def discard_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [k for k in self._items if k[0] == prefix]:
+                del self._items[key]
+
+
+def _version_id(checkpoint_ns: str, checkpoint_id: str) -> str:
+    # checkpoint ids are uuid6, so root-namespace doc ids sort by time
+    return f"{checkpoint_ns}#{checkpoint_id}" if checkpoint_ns else checkpoint_id
+
+
+def _thread_config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Dict[str, Any]:
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+        }
+    }
 
 
 class FirestoreCheckpointer(BaseCheckpointSaver):
     def __init__(self):
+        super().__init__()
         # Ensure Firebase app exists (main.py usually initializes it)
         if not firebase_admin._apps:
             raise RuntimeError(
                 "Firebase not initialized. Initialize firebase_admin in main.py before using FirestoreCheckpointer."
             )
         self.db = firestore.client()
+        # Native async client for the a* methods (no thread pool hop)
+        self.adb = firestore_async.client()
+        # (thread_id, blob_id) -> (type, raw bytes); blobs are immutable, so entries never go stale
+        self._blob_cache = _LRU(CHECKPOINT_CACHE_MAX_BLOBS)
+        # (thread_id, checkpoint_ns, checkpoint_id) -> {channel: blob_id}, to diff against the parent
+        self._blob_maps = _LRU(CHECKPOINT_CACHE_MAX_VERSIONS)
 
-    def put(self, config, checkpoint, metadata, new_versions):
+    # -- encoding -----------------------------------------------------------
+
+    def _dumps(self, value: Any) -> Dict[str, Any]:
+        type_, data = self.serde.dumps_typed(value)
+        codec, blob = _encode(data)
+        return {"type": type_, "codec": codec, "data": blob}
+
+    def _loads(self, stored: Dict[str, Any]) -> Any:
+        return self.serde.loads_typed((stored["type"], _decode(stored["codec"], stored["data"])))
+
+    def _version_doc(self, config, checkpoint, metadata, channel_blobs: Dict[str, str]) -> Dict[str, Any]:
+        metadata = get_checkpoint_metadata(config, metadata)
+        stripped = {**checkpoint, "channel_values": {}}
+        return {
+            "thread_id": config["configurable"]["thread_id"],
+            "checkpoint_ns": config["configurable"].get("checkpoint_ns", ""),
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+            "checkpoint": self._dumps(stripped),
+            "channel_blobs": channel_blobs,
+            "metadata": self._dumps(metadata),
+            "step": metadata.get("step"),
+            "created_at": firestore.SERVER_TIMESTAMP,
+        }
+
+    def _blob(self, thread_id: str, checkpoint_ns: str, channel: str, value: Any, new_blobs, known: Optional[str] = None) -> str:
+        """Content-addressed blob id for a channel value; queues it in new_blobs unless it is
+        `known` (the parent's id) or already stored."""
+        type_, data = self.serde.dumps_typed(value)
+        blob_id = _blob_id(checkpoint_ns, channel, type_, data)
+        if blob_id != known and self._blob_cache.get((thread_id, blob_id)) is None:
+            new_blobs[blob_id] = (channel, type_, data)
+        return blob_id
+
+    def _diff_channels(self, config, checkpoint, new_versions, parent_blobs: Optional[Dict[str, str]]):
+        """({channel: blob_id} for this checkpoint, {blob_id: (channel, type, bytes)} to write).
+        Unchanged channels reuse the parent's blob; a channel in new_versions whose value
+        serializes to the same bytes (nodes return {**state, ...}) also resolves to the same id."""
         thread_id = config["configurable"]["thread_id"]
-        self.db.collection("checkpoints").document(thread_id).set(
-            {
-                "checkpoint": json.dumps(checkpoint, default=str),
-                "metadata": json.dumps(metadata, default=str),
-                "updated_at": firestore.SERVER_TIMESTAMP,
-            }
-        )
-        return config
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_blobs = parent_blobs or {}
+        channel_blobs: Dict[str, str] = {}
+        new_blobs: Dict[str, Tuple[str, str, bytes]] = {}
+        for channel, value in checkpoint["channel_values"].items():
+            if channel not in new_versions and channel in parent_blobs:
+                channel_blobs[channel] = parent_blobs[channel]
+            else:
+                channel_blobs[channel] = self._blob(
+                    thread_id, checkpoint_ns, channel, value, new_blobs, parent_blobs.get(channel)
+                )
+        return channel_blobs, new_blobs
+
+    def _remember_blobs(self, thread_id: str, new_blobs) -> None:
+        """After a successful commit, so a failed batch never marks a blob as stored."""
+        for blob_id, (_, type_, data) in new_blobs.items():
+            self._blob_cache.put((thread_id, blob_id), (type_, data))
+
+    def _remember_put(self, next_config, channel_blobs, new_blobs) -> None:
+        self._remember_blobs(next_config["configurable"]["thread_id"], new_blobs)
+        self._blob_maps.put(self._parent_key(next_config), channel_blobs)
 
-    def put_writes(self, config, writes, task_id, task_path=None):
+    def _write_docs(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str):
+        """([(doc id, doc)], new blobs). Values go to the blob store too, so a node that writes
+        back unchanged state only adds small reference docs. Special channels (errors,
+        interrupts...) have a fixed negative index, so a retry overwrites them instead of appending."""
         thread_id = config["configurable"]["thread_id"]
-        self.db.collection("checkpoints").document(f"{thread_id}_writes").set(
-            {
-                "writes": json.dumps([(w[0], w[1]) for w in writes], default=str),
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        new_blobs: Dict[str, Tuple[str, str, bytes]] = {}
+        docs = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            docs.append((f"{task_id}#{idx}", {
                 "task_id": task_id,
                 "task_path": task_path,
-                "updated_at": firestore.SERVER_TIMESTAMP,
+                "idx": idx,
+                "channel": channel,
+                "blob_id": self._blob(thread_id, checkpoint_ns, channel, value, new_blobs),
+            }))
+        return docs, new_blobs
+
+    def _set_blobs(self, db, batch, thread_id: str, new_blobs) -> None:
+        blobs_ref = self._thread_ref(db, thread_id).collection(BLOBS)
+        for blob_id, (channel, type_, data) in new_blobs.items():
+            codec, blob = _encode(data)
+            batch.set(blobs_ref.document(blob_id), {"channel": channel, "type": type_, "codec": codec, "data": blob})
+
+    def _to_tuple(self, data: Dict[str, Any], writes: List[Dict[str, Any]], blobs: Dict[str, Tuple[str, bytes]]) -> CheckpointTuple:
+        thread_id = data["thread_id"]
+        checkpoint_ns = data.get("checkpoint_ns", "")
+        parent_id = data.get("parent_checkpoint_id")
+        checkpoint = self._loads(data["checkpoint"])
+        if "channel_blobs" in data:
+            checkpoint["channel_values"] = {
+                channel: self.serde.loads_typed(blobs[blob_id])
+                for channel, blob_id in data["channel_blobs"].items()
             }
+            self._blob_maps.put((thread_id, checkpoint_ns, data["checkpoint_id"]), dict(data["channel_blobs"]))
+        writes = sorted(writes, key=lambda w: (w.get("task_path", ""), w["task_id"], w["idx"]))
+        return CheckpointTuple(
+            config=_thread_config(thread_id, checkpoint_ns, data["checkpoint_id"]),
+            checkpoint=checkpoint,
+            metadata=self._loads(data["metadata"]),
+            parent_config=_thread_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=[
+                (w["task_id"], w["channel"], self.serde.loads_typed(blobs[w["blob_id"]]) if "blob_id" in w else self._loads(w["value"]))
+                for w in writes
+            ],
         )
 
-    def get_tuple(self, config) -> Optional[CheckpointTuple]:
-        thread_id = config["configurable"]["thread_id"]
-        doc = self.db.collection("checkpoints").document(thread_id).get()
-        if not doc.exists:
+    def _missing_blobs(self, db, data: Dict[str, Any], writes: List[Dict[str, Any]]):
+        """(blobs found in cache, refs still to fetch) for a version doc and its pending writes."""
+        thread_id = data["thread_id"]
+        blobs: Dict[str, Tuple[str, bytes]] = {}
+        refs = []
+        blob_ids = set((data.get("channel_blobs") or {}).values())
+        blob_ids.update(w["blob_id"] for w in writes if "blob_id" in w)
+        for blob_id in blob_ids:
+            cached = self._blob_cache.get((thread_id, blob_id))
+            if cached is not None:
+                blobs[blob_id] = cached
+            else:
+                refs.append(self._thread_ref(db, thread_id).collection(BLOBS).document(blob_id))
+        return blobs, refs
+
+    def _add_blob(self, blobs, thread_id: str, snap) -> None:
+        if not snap.exists:
+            raise ValueError(f"Checkpoint blob {snap.id} for thread {thread_id} is missing")
+        stored = snap.to_dict()
+        value = (stored["type"], _decode(stored["codec"], stored["data"]))
+        blobs[snap.id] = value
+        self._blob_cache.put((thread_id, snap.id), value)
+
+    @staticmethod
+    def _matches(metadata: Dict[str, Any], filter: Optional[Dict[str, Any]]) -> bool:
+        return not filter or all(metadata.get(k) == v for k, v in filter.items())
+
+    # -- refs and queries (shared by sync and async clients) ------------------
+
+    @staticmethod
+    def _thread_ref(db, thread_id: str):
+        return db.collection("checkpoints").document(thread_id)
+
+    def _version_ref(self, db, config):
+        conf = config["configurable"]
+        return self._thread_ref(db, conf["thread_id"]).collection(VERSIONS).document(
+            _version_id(conf.get("checkpoint_ns", ""), conf["checkpoint_id"])
+        )
+
+    def _history_query(self, db, config, before=None, limit: Optional[int] = None):
+        conf = config["configurable"]
+        q = (
+            self._thread_ref(db, conf["thread_id"])
+            .collection(VERSIONS)
+            .where(filter=FieldFilter("checkpoint_ns", "==", conf.get("checkpoint_ns", "")))
+        )
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            q = q.where(filter=FieldFilter("checkpoint_id", "<", before_id))
+        q = q.order_by("checkpoint_id", direction=firestore.Query.DESCENDING)
+        if limit is not None:
+            q = q.limit(limit)
+        return q
+
+    def _parent_key(self, config):
+        conf = config["configurable"]
+        parent_id = conf.get("checkpoint_id")
+        return (conf["thread_id"], conf.get("checkpoint_ns", ""), parent_id) if parent_id else None
+
+    def _put_batch(self, db, config, checkpoint, metadata, new_versions, parent_blobs):
+        conf = config["configurable"]
+        thread_id = conf["thread_id"]
+        checkpoint_ns = conf.get("checkpoint_ns", "")
+        next_config = _thread_config(thread_id, checkpoint_ns, checkpoint["id"])
+        channel_blobs, new_blobs = self._diff_channels(config, checkpoint, new_versions, parent_blobs)
+        doc = self._version_doc(config, checkpoint, metadata, channel_blobs)
+        batch = db.batch()
+        self._set_blobs(db, batch, thread_id, new_blobs)
+        batch.set(self._version_ref(db, next_config), doc)
+        if not checkpoint_ns:
+            batch.set(
+                self._thread_ref(db, thread_id),
+                {
+                    "thread_id": thread_id,
+                    "latest_checkpoint_id": checkpoint["id"],
+                    "step": doc["step"],
+                    "updated_at": firestore.SERVER_TIMESTAMP,
+                },
+                merge=True,
+            )
+        return batch, next_config, channel_blobs, new_blobs
+
+    def _put_writes_batch(self, db, config, writes, task_id: str, task_path: str):
+        version_ref = self._version_ref(db, config)
+        docs, new_blobs = self._write_docs(config, writes, task_id, task_path)
+        batch = db.batch()
+        self._set_blobs(db, batch, config["configurable"]["thread_id"], new_blobs)
+        for doc_id, doc in docs:
+            batch.set(version_ref.collection(WRITES).document(doc_id), doc)
+        return batch, new_blobs
+
+    # -- sync API -----------------------------------------------------------
+
+    def _parent_blobs(self, config) -> Optional[Dict[str, str]]:
+        key = self._parent_key(config)
+        if key is None:
             return None
+        cached = self._blob_maps.get(key)
+        if cached is None:
+            snap = self._version_ref(self.db, config).get()
+            cached = (snap.to_dict() or {}).get("channel_blobs") if snap.exists else None
+        return cached
 
-        data = doc.to_dict()
-        return CheckpointTuple(
-            config=config,
-            checkpoint=json.loads(data["checkpoint"]),
-            metadata=json.loads(data["metadata"]),
-            parent_config=None,
+    def put(self, config, checkpoint, metadata, new_versions):
+        batch, next_config, channel_blobs, new_blobs = self._put_batch(
+            self.db, config, checkpoint, metadata, new_versions, self._parent_blobs(config)
         )
+        batch.commit()
+        self._remember_put(next_config, channel_blobs, new_blobs)
+        return next_config
 
-    def list(self, config, limit=None, before=None) -> Iterator[CheckpointTuple]:
-        # Not needed for MVP
-        return iter([])
+    def put_writes(self, config, writes, task_id, task_path=""):
+        if writes:
+            batch, new_blobs = self._put_writes_batch(self.db, config, writes, task_id, task_path)
+            batch.commit()
+            self._remember_blobs(config["configurable"]["thread_id"], new_blobs)
 
-    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
-        return await asyncio.to_thread(self.get_tuple, config)
+    def _load(self, snap) -> CheckpointTuple:
+        data = snap.to_dict()
+        writes = [w.to_dict() for w in snap.reference.collection(WRITES).stream()]
+        blobs, refs = self._missing_blobs(self.db, data, writes)
+        if refs:
+            for blob_snap in self.db.get_all(refs):
+                self._add_blob(blobs, data["thread_id"], blob_snap)
+        return self._to_tuple(data, writes, blobs)
 
-    async def aput(
-        self,
-        config,
-        checkpoint,
-        metadata,
-        new_versions,
-    ):
-        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
-
-    async def aput_writes(
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        if get_checkpoint_id(config):
+            snap = self._version_ref(self.db, config).get()
+            return self._load(snap) if snap.exists else None
+        for snap in self._history_query(self.db, config, limit=1).stream():
+            return self._load(snap)
+        return None
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        """Newest first. Requires a thread_id in config."""
+        if config is None:
+            raise ValueError("FirestoreCheckpointer.list() needs a config with a thread_id")
+        if get_checkpoint_id(config):
+            found = self.get_tuple(config)
+            if found is not None and self._matches(found.metadata, filter):
+                yield found
+            return
+        remaining = limit
+        # Only push the limit to Firestore when there's no metadata filter to apply after
+        for snap in self._history_query(self.db, config, before, None if filter else limit).stream():
+            if remaining is not None and remaining <= 0:
+                return
+            item = self._load(snap)
+            if not self._matches(item.metadata, filter):
+                continue
+            yield item
+            if remaining is not None:
+                remaining -= 1
+
+    def _thread_docs(self, thread_ref) -> Iterator[Any]:
+        """Every version, pending write and blob snapshot under a thread (not the summary doc)."""
+        for version in thread_ref.collection(VERSIONS).stream():
+            yield version
+            yield from version.reference.collection(WRITES).stream()
+        yield from thread_ref.collection(BLOBS).stream()
+
+    def _delete_refs(self, refs: Sequence[Any]) -> None:
+        for start in range(0, len(refs), MAX_BATCH_DELETES):
+            batch = self.db.batch()
+            for ref in refs[start:start + MAX_BATCH_DELETES]:
+                batch.delete(ref)
+            batch.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        thread_ref = self._thread_ref(self.db, thread_id)
+        self._delete_refs([snap.reference for snap in self._thread_docs(thread_ref)] + [thread_ref])
+        self._blob_cache.discard_prefix(thread_id)
+        self._blob_maps.discard_prefix(thread_id)
+
+    # -- compaction (sync; checkpoint_gc.py runs it off the event loop) ---------
+
+    def stale_threads(self, updated_before, limit: int, start_after=None) -> List[Any]:
+        """Summary docs in checkpoints/ last written before updated_before, oldest first.
+        Includes docs from the pre-delta layout ({thread_id} with a JSON checkpoint, {thread_id}_writes)."""
+        q = (
+            self.db.collection("checkpoints")
+            .where(filter=FieldFilter("updated_at", "<", updated_before))
+            .order_by("updated_at")
+            .limit(limit)
+        )
+        if start_after is not None:
+            q = q.start_after(start_after)
+        return list(q.stream())
+
+    def thread_state(self, snap) -> Optional[Dict[str, Any]]:
+        """Channel values of the latest root checkpoint behind a summary doc, or None."""
+        data = snap.to_dict() or {}
+        if "checkpoint" in data:
+            # Pre-delta layout: the whole checkpoint as one JSON string
+            return json.loads(data["checkpoint"]).get("channel_values")
+        found = self.get_tuple({"configurable": {"thread_id": snap.id, "checkpoint_ns": ""}})
+        return found.checkpoint["channel_values"] if found else None
+
+    def compact_thread(
         self,
-        config,
-        writes,
-        task_id: str,
-        task_path: str = "",
-    ) -> None:
-        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+        snap,
+        record: Optional[Dict[str, Any]] = None,
+        final_state: Optional[Dict[str, Any]] = None,
+        dry_run: bool = False,
+    ) -> Tuple[int, int]:
+        """Delete every doc of a thread in batched commits, leaving record (plus the encoded
+        final_state) in checkpoint_archive/{thread_id} when given. Returns (docs deleted, bytes reclaimed)."""
+        sizes = [(snap.reference, _doc_size(snap))]
+        sizes.extend((doc.reference, _doc_size(doc)) for doc in self._thread_docs(snap.reference))
+        reclaimed = sum(size for _, size in sizes)
+        if dry_run:
+            return len(sizes), reclaimed
+        if record is not None:
+            self.db.collection(ARCHIVE).document(snap.id).set(
+                {
+                    **record,
+                    "thread_id": snap.id,
+                    "final_state": self._dumps(final_state) if final_state is not None else None,
+                    "docs_deleted": len(sizes),
+                    "bytes_reclaimed": reclaimed,
+                    "archived_at": firestore.SERVER_TIMESTAMP,
+                }
+            )
+        self._delete_refs([ref for ref, _ in sizes])
+        self._blob_cache.discard_prefix(snap.id)
+        self._blob_maps.discard_prefix(snap.id)
+        return len(sizes), reclaimed
+
+    # -- async API ----------------------------------------------------------
+
+    async def _aparent_blobs(self, config) -> Optional[Dict[str, str]]:
+        key = self._parent_key(config)
+        if key is None:
+            return None
+        cached = self._blob_maps.get(key)
+        if cached is None:
+            snap = await self._version_ref(self.adb, config).get()
+            cached = (snap.to_dict() or {}).get("channel_blobs") if snap.exists else None
+        return cached
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        batch, next_config, channel_blobs, new_blobs = self._put_batch(
+            self.adb, config, checkpoint, metadata, new_versions, await self._aparent_blobs(config)
+        )
+        await batch.commit()
+        self._remember_put(next_config, channel_blobs, new_blobs)
+        return next_config
+
+    async def aput_writes(self, config, writes, task_id: str, task_path: str = "") -> None:
+        if writes:
+            batch, new_blobs = self._put_writes_batch(self.adb, config, writes, task_id, task_path)
+            await batch.commit()
+            self._remember_blobs(config["configurable"]["thread_id"], new_blobs)
+
+    async def _aload(self, snap) -> CheckpointTuple:
+        data = snap.to_dict()
+        writes = [w.to_dict() async for w in snap.reference.collection(WRITES).stream()]
+        blobs, refs = self._missing_blobs(self.adb, data, writes)
+        if refs:
+            async for blob_snap in self.adb.get_all(refs):
+                self._add_blob(blobs, data["thread_id"], blob_snap)
+        return self._to_tuple(data, writes, blobs)
+
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        if get_checkpoint_id(config):
+            snap = await self._version_ref(self.adb, config).get()
+            return await self._aload(snap) if snap.exists else None
+        async for snap in self._history_query(self.adb, config, limit=1).stream():
+            return await self._aload(snap)
+        return None
 
     async def alist(
         self,
@@ -85,6 +535,32 @@ class FirestoreCheckpointer(BaseCheckpointSaver):
         before=None,
         limit=None,
     ) -> AsyncIterator[CheckpointTuple]:
-        result = await asyncio.to_thread(self.list, config, limit=limit, before=before)
-        for item in result:
-            yield item
\ No newline at end of file
+        if config is None:
+            raise ValueError("FirestoreCheckpointer.alist() needs a config with a thread_id")
+        if get_checkpoint_id(config):
+            found = await self.aget_tuple(config)
+            if found is not None and self._matches(found.metadata, filter):
+                yield found
+            return
+        remaining = limit
+        async for snap in self._history_query(self.adb, config, before, None if filter else limit).stream():
+            if remaining is not None and remaining <= 0:
+                return
+            item = await self._aload(snap)
+            if not self._matches(item.metadata, filter):
+                continue
+            yield item
+            if remaining is not None:
+                remaining -= 1
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        thread_ref = self._thread_ref(self.adb, thread_id)
+        async for version in thread_ref.collection(VERSIONS).stream():
+            async for write in version.reference.collection(WRITES).stream():
+                await write.reference.delete()
+            await version.reference.delete()
+        async for blob in thread_ref.collection(BLOBS).stream():
+            await blob.reference.delete()
+        await thread_ref.delete()
+        self._blob_cache.discard_prefix(thread_id)
+        self._blob_maps.discard_prefix(thread_id)
@@ -0,0 +1,311 @@
+"""
+Async counterpart of firestore_tools on google.cloud.firestore.AsyncClient.
+Same function names and behavior, awaited natively instead of through asyncio.to_thread.
+Functions only the app needs (batch rejections, run-write flushes, resume claims) exist here
+only; both modules build documents with the shared new_*_doc/row helpers.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from firebase_admin import firestore, firestore_async
+from google.cloud.firestore import FieldFilter, async_transactional
+
+from firestore_tools import firestore_op, init_app, new_decision_row, new_proposal_doc, now_ts
+
+_db = None
+
+
+def init_async_db():
+    global _db
+    if _db is not None:
+        return _db
+
+    _db = firestore_async.client(init_app())
+    return _db
+
+
+@firestore_op
+async def facility_profile_get(facility_id: str) -> Optional[Dict[str, Any]]:
+    db = init_async_db()
+    snap = await db.collection("facility_profiles").document(facility_id).get()
+    if not snap.exists:
+        return None
+    out = snap.to_dict()
+    out["facility_id"] = facility_id
+    return out
+
+
+@firestore_op
+async def facility_profile_list() -> List[Dict[str, Any]]:
+    db = init_async_db()
+    out: List[Dict[str, Any]] = []
+    async for doc in db.collection("facility_profiles").stream():
+        d = doc.to_dict()
+        d["facility_id"] = doc.id
+        out.append(d)
+    return out
+
+
+@firestore_op
+async def facility_profile_upsert(facility_id: str, patch: Dict[str, Any]) -> None:
+    db = init_async_db()
+    patch = dict(patch)
+    patch["updated_at"] = now_ts()
+    await db.collection("facility_profiles").document(facility_id).set(patch, merge=True)
+
+
+@firestore_op
+async def proposal_create(facility_id: str) -> str:
+    db = init_async_db()
+    ref = db.collection("proposals").document()
+    run_id = ref.id
+    await ref.set(new_proposal_doc(run_id, facility_id))
+    return run_id
+
+
+@firestore_op
+async def proposal_create_rejected_batch(rejections: List[Dict[str, Any]]) -> List[str]:
+    """Create already-rejected proposals plus their orchestrator decision rows in batched commits.
+    Each rejection: {facility_id, reason, input_summary, rationale}. Returns run_ids in order."""
+    db = init_async_db()
+    run_ids: List[str] = []
+    # 2 writes per rejection; Firestore allows 500 writes per batch
+    for start in range(0, len(rejections), 250):
+        batch = db.batch()
+        for item in rejections[start:start + 250]:
+            ref = db.collection("proposals").document()
+            run_ids.append(ref.id)
+            batch.set(
+                ref,
+                {**new_proposal_doc(ref.id, item["facility_id"]), "status": "rejected", "feedback_text": item["reason"]},
+            )
+            batch.set(
+                db.collection("agent_decisions").document(),
+                new_decision_row(
+                    ref.id,
+                    item["facility_id"],
+                    "orchestrator",
+                    item["input_summary"],
+                    {"disqualified": True, "reason": item["reason"], "prescreened": True},
+                    "high",
+                    item["rationale"],
+                ),
+            )
+        await batch.commit()
+    return run_ids
+
+
+@firestore_op
+async def proposal_get(run_id: str) -> Optional[Dict[str, Any]]:
+    db = init_async_db()
+    snap = await db.collection("proposals").document(run_id).get()
+    if not snap.exists:
+        return None
+    out = snap.to_dict()
+    out["run_id"] = run_id
+    return out
+
+
+@firestore_op
+async def proposal_update(run_id: str, patch: Dict[str, Any]) -> None:
+    db = init_async_db()
+    patch = dict(patch)
+    patch["updated_at"] = now_ts()
+    await db.collection("proposals").document(run_id).set(patch, merge=True)
+
+
+@firestore_op
+async def proposal_supersede_older_pending(facility_id: str, keep_run_id: str) -> int:
+    """Mark older pending_review proposals for this facility as rejected. Director only sees latest."""
+    db = init_async_db()
+    q = (
+        db.collection("proposals")
+        .where(filter=FieldFilter("facility_id", "==", facility_id))
+        .where(filter=FieldFilter("status", "==", "pending_review"))
+    )
+    refs = [doc.reference async for doc in q.stream() if doc.id != keep_run_id]
+    # Firestore allows 500 writes per batch
+    for start in range(0, len(refs), 250):
+        batch = db.batch()
+        for ref in refs[start:start + 250]:
+            batch.set(
+                ref,
+                {
+                    "status": "rejected",
+                    "feedback_text": "Superseded by newer run",
+                    "updated_at": now_ts(),
+                },
+                merge=True,
+            )
+        await batch.commit()
+    return len(refs)
+
+
+@firestore_op
+async def proposal_save_draft(
+    run_id: str,
+    facility_id: str,
+    proposal_json: Dict[str, Any],
+    urgency_score: Optional[float] = None,
+) -> None:
+    db = init_async_db()
+    # Supersede older pending proposals for this facility — only latest matters
+    await proposal_supersede_older_pending(facility_id, run_id)
+    await db.collection("proposals").document(run_id).set(
+        {
+            "run_id": run_id,
+            "facility_id": facility_id,
+            "proposal_json": proposal_json,
+            "urgency_score": urgency_score,
+            "status": "pending_review",
+            "updated_at": now_ts(),
+        },
+        merge=True,
+    )
+
+
+@firestore_op
+async def proposal_update_decision(
+    run_id: str,
+    status: str,
+    reviewer_uid: str,
+    feedback_text: Optional[str] = None,
+) -> None:
+    db = init_async_db()
+    snap = await db.collection("proposals").document(run_id).get()
+    if not snap.exists:
+        raise ValueError(f"Proposal {run_id} not found")
+    data = snap.to_dict() or {}
+
+    if status in ("approved", "rejected"):
+        facility_id = data.get("facility_id")
+        if facility_id:
+            await proposal_supersede_older_pending(facility_id, run_id)
+
+    patch: Dict[str, Any] = {
+        "status": status,
+        "reviewer_uid": reviewer_uid,
+        "feedback_text": feedback_text,
+        "reviewed_at": now_ts(),
+        "updated_at": now_ts(),
+    }
+
+    if status == "revision_requested":
+        revision_count = int(data.get("revision_count", 0))
+        patch["revision_count"] = revision_count + 1
+
+    await db.collection("proposals").document(run_id).set(patch, merge=True)
+
+
+@firestore_op
+async def proposal_list_pending() -> List[Dict[str, Any]]:
+    db = init_async_db()
+    q = (
+        db.collection("proposals")
+        .where(filter=FieldFilter("status", "==", "pending_review"))
+        .order_by("urgency_score", direction=firestore.Query.DESCENDING)
+    )
+
+    out: List[Dict[str, Any]] = []
+    async for doc in q.stream():
+        d = doc.to_dict()
+        d["run_id"] = doc.id
+        out.append(d)
+    return out
+
+
+@firestore_op
+async def proposal_list_unfinished(
+    statuses: Sequence[str],
+    updated_after: datetime,
+    limit: int,
+) -> List[Dict[str, Any]]:
+    """Most recently updated proposals still in one of statuses. Uses the (status, updated_at) index."""
+    db = init_async_db()
+    q = (
+        db.collection("proposals")
+        .where(filter=FieldFilter("status", "in", list(statuses)))
+        .where(filter=FieldFilter("updated_at", ">=", updated_after))
+        .order_by("updated_at", direction=firestore.Query.DESCENDING)
+        .limit(limit)
+    )
+
+    out: List[Dict[str, Any]] = []
+    async for doc in q.stream():
+        d = doc.to_dict()
+        d["run_id"] = doc.id
+        out.append(d)
+    return out
+
+
+@firestore_op
+async def proposal_claim_for_resume(
+    run_id: str,
+    expected_updated_at: Any,
+    statuses: Sequence[str],
+    max_attempts: int,
+) -> bool:
+    """Atomically move an unfinished proposal to "resuming". False if anything touched it since
+    it was read (another resume, or the original run is still writing) or it ran out of attempts."""
+    db = init_async_db()
+    ref = db.collection("proposals").document(run_id)
+
+    @async_transactional
+    async def _claim(transaction) -> bool:
+        snap = await ref.get(transaction=transaction)
+        data = snap.to_dict() if snap.exists else None
+        if (
+            not data
+            or data.get("status") not in statuses
+            or data.get("updated_at") != expected_updated_at
+            or int(data.get("resume_count", 0)) >= max_attempts
+        ):
+            return False
+        transaction.set(
+            ref,
+            {
+                "status": "resuming",
+                "resume_count": int(data.get("resume_count", 0)) + 1,
+                "updated_at": now_ts(),
+            },
+            merge=True,
+        )
+        return True
+
+    return await _claim(db.transaction())
+
+
+@firestore_op
+async def commit_run_writes(
+    run_id: str,
+    proposal_patch: Dict[str, Any],
+    decisions: List[Dict[str, Any]],
+) -> None:
+    """Apply a merged proposal patch and append decision rows in one WriteBatch."""
+    db = init_async_db()
+    batch = db.batch()
+    if proposal_patch:
+        patch = dict(proposal_patch)
+        patch["updated_at"] = now_ts()
+        batch.set(db.collection("proposals").document(run_id), patch, merge=True)
+    for row in decisions:
+        row = dict(row)
+        row.setdefault("timestamp", now_ts())
+        batch.set(db.collection("agent_decisions").document(), row)
+    await batch.commit()
+
+
+@firestore_op
+async def agent_decision_append(
+    run_id: str,
+    facility_id: str,
+    agent_name: str,
+    input_summary: str,
+    output_json: Dict[str, Any],
+    confidence: str,
+    rationale: str,
+) -> None:
+    db = init_async_db()
+    await db.collection("agent_decisions").add(
+        new_decision_row(run_id, facility_id, agent_name, input_summary, output_json, confidence, rationale)
+    )
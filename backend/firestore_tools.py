@@ -7,20 +7,28 @@ from firebase_admin import credentials, firestore
 from google.cloud.firestore import FieldFilter
 from dotenv import load_dotenv
 
+from metrics import firestore_seconds, timed_calls
+from tracing import traced_calls
+
 load_dotenv(dotenv_path=".env")
 
 _app = None
 _db = None
 
 
+def firestore_op(fn):
+    """Latency metric and trace span for every call of a Firestore operation."""
+    return traced_calls("firestore", {"db.system": "firestore"})(timed_calls(firestore_seconds)(fn))
+
+
 def now_ts():
     return datetime.now(timezone.utc)
 
 
-def init_db():
-    global _app, _db
-    if _db is not None:
-        return _db
+def init_app():
+    global _app
+    if _app is not None:
+        return _app
 
     if firebase_admin._apps:
         _app = firebase_admin.get_app()
@@ -28,11 +36,57 @@ def init_db():
         service_account_path = os.getenv("SERVICE_ACCOUNT_PATH", "serviceAccountKey.json")
         cred = credentials.Certificate(service_account_path)
         _app = firebase_admin.initialize_app(cred)
+    return _app
+
+
+def init_db():
+    global _db
+    if _db is not None:
+        return _db
 
+    init_app()
     _db = firestore.client()
     return _db
 
 
+def new_proposal_doc(run_id: str, facility_id: str) -> Dict[str, Any]:
+    return {
+        "run_id": run_id,
+        "facility_id": facility_id,
+        "status": "created",
+        "proposal_json": None,
+        "urgency_score": None,
+        "revision_count": 0,
+        "reviewer_uid": None,
+        "feedback_text": None,
+        "created_at": now_ts(),
+        "reviewed_at": None,
+        "updated_at": now_ts(),
+    }
+
+
+def new_decision_row(
+    run_id: str,
+    facility_id: str,
+    agent_name: str,
+    input_summary: str,
+    output_json: Dict[str, Any],
+    confidence: str,
+    rationale: str,
+) -> Dict[str, Any]:
+    return {
+        "run_id": run_id,
+        "facility_id": facility_id,
+        "agent_name": agent_name,
+        "input_summary": input_summary,
+        "output_json": output_json,
+        "confidence": confidence,
+        "rationale": rationale,
+        "timestamp": now_ts(),
+    }
+
+
+@firestore_op
 def facility_profile_get(facility_id: str) -> Optional[Dict[str, Any]]:
     db = init_db()
     snap = db.collection("facility_profiles").document(facility_id).get()
@@ -43,6 +97,7 @@ def facility_profile_get(facility_id: str) -> Optional[Dict[str, Any]]:
     return out
 
 
+@firestore_op
 def facility_profile_upsert(facility_id: str, patch: Dict[str, Any]) -> None:
     db = init_db()
     patch = dict(patch)
@@ -50,28 +105,16 @@ def facility_profile_upsert(facility_id: str, patch: Dict[str, Any]) -> None:
     db.collection("facility_profiles").document(facility_id).set(patch, merge=True)
 
 
+@firestore_op
 def proposal_create(facility_id: str) -> str:
     db = init_db()
     ref = db.collection("proposals").document()
     run_id = ref.id
-    ref.set(
-        {
-            "run_id": run_id,
-            "facility_id": facility_id,
-            "status": "created",
-            "proposal_json": None,
-            "urgency_score": None,
-            "revision_count": 0,
-            "reviewer_uid": None,
-            "feedback_text": None,
-            "created_at": now_ts(),
-            "reviewed_at": None,
-            "updated_at": now_ts(),
-        }
-    )
+    ref.set(new_proposal_doc(run_id, facility_id))
     return run_id
 
 
+@firestore_op
 def proposal_get(run_id: str) -> Optional[Dict[str, Any]]:
     db = init_db()
     snap = db.collection("proposals").document(run_id).get()
@@ -82,6 +125,23 @@ def proposal_get(run_id: str) -> Optional[Dict[str, Any]]:
     return out
 
 
+@firestore_op
+def proposal_get_many(run_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """run_id -> proposal for the ones that exist, in one batched get."""
+    if not run_ids:
+        return {}
+    db = init_db()
+    refs = [db.collection("proposals").document(run_id) for run_id in dict.fromkeys(run_ids)]
+    out: Dict[str, Dict[str, Any]] = {}
+    for snap in db.get_all(refs):
+        if snap.exists:
+            d = snap.to_dict()
+            d["run_id"] = snap.id
+            out[snap.id] = d
+    return out
+
+
+@firestore_op
 def proposal_update(run_id: str, patch: Dict[str, Any]) -> None:
     db = init_db()
     patch = dict(patch)
@@ -89,6 +149,7 @@ def proposal_update(run_id: str, patch: Dict[str, Any]) -> None:
     db.collection("proposals").document(run_id).set(patch, merge=True)
 
 
+@firestore_op
 def proposal_supersede_older_pending(facility_id: str, keep_run_id: str) -> int:
     """Mark older pending_review proposals for this facility as rejected. Director only sees latest."""
     db = init_db()
@@ -113,6 +174,7 @@ def proposal_supersede_older_pending(facility_id: str, keep_run_id: str) -> int:
     return count
 
 
+@firestore_op
 def proposal_save_draft(
     run_id: str,
     facility_id: str,
@@ -135,6 +197,7 @@ def proposal_save_draft(
     )
 
 
+@firestore_op
 def proposal_update_decision(
     run_id: str,
     status: str,
@@ -169,6 +232,7 @@ def proposal_update_decision(
     db.collection("proposals").document(run_id).set(patch, merge=True)
 
 
+@firestore_op
 def proposal_list_pending() -> List[Dict[str, Any]]:
     db = init_db()
     q = (
@@ -185,6 +249,7 @@ def proposal_list_pending() -> List[Dict[str, Any]]:
     return out
 
 
+@firestore_op
 def agent_decision_append(
     run_id: str,
     facility_id: str,
@@ -196,14 +261,101 @@ def agent_decision_append(
 ) -> None:
     db = init_db()
     db.collection("agent_decisions").add(
-        {
-            "run_id": run_id,
-            "facility_id": facility_id,
-            "agent_name": agent_name,
-            "input_summary": input_summary,
-            "output_json": output_json,
-            "confidence": confidence,
-            "rationale": rationale,
-            "timestamp": now_ts(),
-        }
-    )
\ No newline at end of file
+        new_decision_row(run_id, facility_id, agent_name, input_summary, output_json, confidence, rationale)
+    )
+
+
+# Operations execute_write_batch accepts, by MCP tool name
+BATCHABLE_OPERATIONS = (
+    "create_proposal",
+    "update_proposal",
+    "upsert_facility_profile",
+    "save_draft_proposal",
+    "save_agent_decision",
+)
+MAX_BATCH_WRITES = 500
+
+
+@firestore_op
+def execute_write_batch(operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply an ordered list of write operations ({"tool": name, "args": {...}}) in one
+    atomic WriteBatch. Returns one result per operation, shaped like the single tool's result."""
+    if not operations:
+        return []
+    db = init_db()
+    batch = db.batch()
+    results: List[Dict[str, Any]] = []
+    writes = 0
+
+    for op in operations:
+        tool = op.get("tool")
+        args = op.get("args") or {}
+        if tool == "create_proposal":
+            ref = db.collection("proposals").document()
+            batch.set(ref, new_proposal_doc(ref.id, args["facility_id"]))
+            results.append({"run_id": ref.id})
+            writes += 1
+        elif tool == "update_proposal":
+            patch = dict(args["patch"])
+            patch["updated_at"] = now_ts()
+            batch.set(db.collection("proposals").document(args["run_id"]), patch, merge=True)
+            results.append({"ok": True})
+            writes += 1
+        elif tool == "upsert_facility_profile":
+            patch = dict(args["patch"])
+            patch["updated_at"] = now_ts()
+            batch.set(db.collection("facility_profiles").document(args["facility_id"]), patch, merge=True)
+            results.append({"ok": True})
+            writes += 1
+        elif tool == "save_draft_proposal":
+            # Supersede query runs now; its writes commit with the rest of the batch
+            q = (
+                db.collection("proposals")
+                .where(filter=FieldFilter("facility_id", "==", args["facility_id"]))
+                .where(filter=FieldFilter("status", "==", "pending_review"))
+            )
+            for doc in q.stream():
+                if doc.id == args["run_id"]:
+                    continue
+                batch.set(
+                    doc.reference,
+                    {
+                        "status": "rejected",
+                        "feedback_text": "Superseded by newer run",
+                        "updated_at": now_ts(),
+                    },
+                    merge=True,
+                )
+                writes += 1
+            batch.set(
+                db.collection("proposals").document(args["run_id"]),
+                {
+                    "run_id": args["run_id"],
+                    "facility_id": args["facility_id"],
+                    "proposal_json": args["proposal_json"],
+                    "urgency_score": args.get("urgency_score"),
+                    "status": "pending_review",
+                    "updated_at": now_ts(),
+                },
+                merge=True,
+            )
+            results.append({"ok": True})
+            writes += 1
+        elif tool == "save_agent_decision":
+            row = new_decision_row(
+                **{
+                    key: args[key]
+                    for key in ("run_id", "facility_id", "agent_name", "input_summary", "output_json", "confidence", "rationale")
+                }
+            )
+            batch.set(db.collection("agent_decisions").document(), row)
+            results.append({"ok": True})
+            writes += 1
+        else:
+            raise ValueError(f"Operation {tool!r} cannot be batched. Allowed: {', '.join(BATCHABLE_OPERATIONS)}")
+
+    if writes > MAX_BATCH_WRITES:
+        raise ValueError(f"Batch has {writes} writes; Firestore allows {MAX_BATCH_WRITES}")
+    if writes:
+        batch.commit()
+    return results
@@ -1,29 +1,36 @@
 import asyncio
-import contextvars
+import functools
 from langgraph.graph import StateGraph, END
-from langgraph.config import get_stream_writer
+from langgraph.config import get_config, get_stream_writer
 from typing import TypedDict, Optional, Dict, Any, Literal
-from pydantic import BaseModel, Field, field_validator
-from openai import OpenAI
+from pydantic import BaseModel, Field, ValidationError, field_validator
 import os, json, re
-from checkpointer import FirestoreCheckpointer
+from checkpoint_tiers import CHECKPOINT_MODE, CheckpointRouter
 
 
 from graph_tools import (
     get_facility_profile,
     create_proposal,
-    update_proposal,
     save_draft_proposal,
-    save_agent_decision,
 )
-
-LLM_MODEL = "liquid/lfm-2.5-1.2b-thinking:free"
-
-
-# Queue for progress events when run via /run endpoint (bypasses LangGraph streaming)
-_progress_queue: contextvars.ContextVar["asyncio.Queue | None"] = contextvars.ContextVar(
-    "progress_queue", default=None
+from write_buffer import (
+    buffer_agent_decision,
+    buffer_proposal_update,
+    flush_run_writes,
+    recording_buffered_runs,
+    schedule_flush,
+    touch_run,
 )
+from llm_client import LLM_MODEL, chat_completion
+from llm_cache import LLM_CACHE_ENABLED, cache_key, llm_cache
+from battery_engine import compute_battery_sizing
+from prescreen import check_disqualifiers
+from metrics import node_seconds, validation_failures
+from tracing import tracer
+# Stage events for the run's event log (bypasses LangGraph streaming)
+from run_events import progress_queue as _progress_queue
+
+GRAPH_PARALLEL_MODE = os.getenv("GRAPH_PARALLEL_MODE", "true").lower() in ("true", "1", "yes")
 
 
 def _emit_stage(stage: str) -> None:
@@ -36,13 +43,6 @@ def _emit_stage(stage: str) -> None:
         pass
 
 
-# OpenAI client for OpenRouter to initialize for later purposes
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-)
-
-
 def extract_json(raw: str) -> dict:
     """Extract a JSON object from LLM output, handling thinking tokens,
     markdown fences, and other preamble text."""
@@ -208,6 +208,12 @@ class AgentState(TypedDict):
     nmc_recommended_flag: Optional[bool]
     priority_tier: Optional[str]
 
+    #set by forced reruns to skip the LLM response cache
+    bypass_llm_cache: Optional[bool]
+
+    #energy load output computed alongside the orchestrator LLM call in parallel mode
+    speculative_energy_load_output: Optional[dict]
+
 
 class OrchestratorOutput(BaseModel):
     priority_tier: Literal["HIGH", "MEDIUM", "MONITOR"]
@@ -345,7 +351,86 @@ class BatterySizingOutput(BaseModel):
             return "Analysis complete. See output fields for details."
         return v
 
-async def orchestrator(state: AgentState) -> AgentState:
+# Agent label on /metrics for each output model's LLM calls
+AGENT_BY_OUTPUT_MODEL = {
+    OrchestratorOutput: "orchestrator",
+    EnergyLoadOutput: "energy_load_agent",
+    BatterySizingOutput: "battery_sizing_agent",
+}
+
+
+async def run_agent_llm(
+    system_prompt: str,
+    user_message: str,
+    output_model: type[BaseModel],
+    state: AgentState,
+    overrides: Optional[dict] = None,
+) -> dict:
+    """Call the LLM and validate its JSON against output_model. Fields in overrides replace
+    whatever the LLM returned for them. Validated outputs are cached by (model, system prompt,
+    user message) unless the run sets bypass_llm_cache."""
+    use_cache = LLM_CACHE_ENABLED and not state.get("bypass_llm_cache")
+    key = cache_key(LLM_MODEL, system_prompt, user_message)
+    if use_cache:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    agent = AGENT_BY_OUTPUT_MODEL.get(output_model, output_model.__name__)
+    raw = await chat_completion(system_prompt, user_message, temperature=0.2, agent=agent)
+    try:
+        parsed = extract_json(raw)
+    except ValueError:
+        validation_failures.inc(output_model.__name__, "json")
+        raise
+    try:
+        validated = output_model(**{**parsed, **(overrides or {})})
+    except ValidationError:
+        validation_failures.inc(output_model.__name__, "schema")
+        raise
+    llm_output = validated.model_dump()
+
+    if LLM_CACHE_ENABLED:
+        llm_cache.put(key, llm_output)
+    return llm_output
+
+
+async def _await_speculative(task: "asyncio.Task | None") -> Optional[dict]:
+    """Result of a speculative LLM task, or None if it failed (the node then retries normally)."""
+    if task is None:
+        return None
+    try:
+        return await task
+    except Exception as e:
+        print(f"Speculative Energy Load call failed, will rerun in node: {e}")
+        return None
+
+
+def _discard_speculative(task: "asyncio.Task | None") -> None:
+    """Cancel a speculative task nobody will await. One that already failed has its exception
+    retrieved, so asyncio doesn't log it as never retrieved."""
+    if task is None:
+        return
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+def _checkpoint_ref() -> Dict[str, Any]:
+    """Where this run's checkpoints live, recorded on the proposal so /runs/{run_id}/resume
+    and the startup sweeper can find them."""
+    configurable = get_config().get("configurable", {})
+    return {
+        "thread_id": configurable.get("thread_id"),
+        "checkpoint_mode": configurable.get("checkpoint_mode") or CHECKPOINT_MODE,
+    }
+
+
+async def orchestrator(state: AgentState, speculative_energy_load: bool = False) -> AgentState:
+    """speculative_energy_load starts the Energy Load LLM call as soon as the hard
+    disqualifiers pass, concurrently with the tier call. Its inputs (profile, nmc flag,
+    feedback) are all known at that point, so only the orchestrator's outcome can void it."""
     facility_id = state["facility_id"]
     print(f"Orchestrator running for {facility_id}")
 
@@ -355,9 +440,9 @@ async def orchestrator(state: AgentState) -> AgentState:
     if not run_id:
         run_id = await create_proposal(facility_id)
 
-    await update_proposal(run_id, {"status": "running"})
+    buffer_proposal_update(run_id, {"status": "running", **_checkpoint_ref()})
 
-    await save_agent_decision(
+    buffer_agent_decision(
         run_id=run_id,
         facility_id=facility_id,
         agent_name="orchestrator",
@@ -367,79 +452,24 @@ async def orchestrator(state: AgentState) -> AgentState:
         rationale="Loaded facility_profile and ensured proposal record exists.",
     )
 
-    if profile.get("annual_diesel_runtime_hours", 0) < 200:
-        reason = "Emergency-Only — Low Priority"
-        await update_proposal(
-            run_id,
-            {
-                "status": "rejected",
-                "feedback_text": reason,
-            },
-        )
-        await save_agent_decision(
-            run_id=run_id,
-            facility_id=facility_id,
-            agent_name="orchestrator",
-            input_summary="annual_diesel_runtime_hours<200",
-            output_json={"disqualified": True, "reason": reason},
-            confidence="high",
-            rationale="Below minimum diesel runtime threshold.",
-        )
-        _emit_stage("orchestrator_done")
-        return {
-            **state,
-            "run_id": run_id,
-            "facility_profile": profile,
-            "disqualified": True,
-            "disqualifier_reason": reason,
-            "status": "disqualified",
-        }
-
-    if profile.get("monthly_demand_charge_usd", 0) < 2000:
-        reason = "Low Demand Charge — Monitor"
-        await update_proposal(
+    rule = check_disqualifiers(profile)
+    if rule is not None:
+        reason = rule.reason
+        buffer_proposal_update(
             run_id,
             {
                 "status": "rejected",
                 "feedback_text": reason,
             },
         )
-        await save_agent_decision(
+        buffer_agent_decision(
             run_id=run_id,
             facility_id=facility_id,
             agent_name="orchestrator",
-            input_summary="monthly_demand_charge_usd<2000",
+            input_summary=rule.input_summary,
             output_json={"disqualified": True, "reason": reason},
             confidence="high",
-            rationale="Below minimum demand charge threshold.",
-        )
-        _emit_stage("orchestrator_done")
-        return {
-            **state,
-            "run_id": run_id,
-            "facility_profile": profile,
-            "disqualified": True,
-            "disqualifier_reason": reason,
-            "status": "disqualified",
-        }
-
-    if profile.get("facility_power_load_kw", 0) < 100:
-        reason = "Below Minimum Scale"
-        await update_proposal(
-            run_id,
-            {
-                "status": "rejected",
-                "feedback_text": reason,
-            },
-        )
-        await save_agent_decision(
-            run_id=run_id,
-            facility_id=facility_id,
-            agent_name="orchestrator",
-            input_summary="facility_power_load_kw<100",
-            output_json={"disqualified": True, "reason": reason},
-            confidence="high",
-            rationale="Below minimum facility load threshold.",
+            rationale=rule.rationale,
         )
         _emit_stage("orchestrator_done")
         return {
@@ -471,26 +501,30 @@ async def orchestrator(state: AgentState) -> AgentState:
     {feedback_block}
     Determine priority tier, routing flags, confidence, and rationale.
     """
+    ira_flag = bool(profile.get("ira_eligible", False))
+    nmc_flag = profile.get("climate_zone", "") == "extreme_cold"
+
+    speculative_task = None
+    if speculative_energy_load:
+        speculative_task = asyncio.create_task(
+            run_agent_llm(
+                ENERGY_LOAD_SYSTEM_PROMPT,
+                build_energy_load_message(profile, nmc_flag, state.get("human_feedback")),
+                EnergyLoadOutput,
+                state,
+            )
+        )
+
     # Orchestrator Agent
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": ORCHESTRATOR_SYSTEM_PROMPT},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.2,
-        )
-        raw = response.choices[0].message.content.strip()
-        llm_output = extract_json(raw)
-        validated = OrchestratorOutput(**llm_output)
-        llm_output = validated.model_dump()
+        llm_output = await run_agent_llm(ORCHESTRATOR_SYSTEM_PROMPT, user_message, OrchestratorOutput, state)
 
     except Exception as e:
         #default to monitor if LLM error occurs so it doesn't freeze
         print(f"Orchestrator LLM error: {e}")
-        await update_proposal(run_id, {"status": "failed", "feedback_text": str(e)})
-        await save_agent_decision(
+        _discard_speculative(speculative_task)
+        buffer_proposal_update(run_id, {"status": "failed", "feedback_text": str(e)})
+        buffer_agent_decision(
             run_id=run_id,
             facility_id=facility_id,
             agent_name="orchestrator",
@@ -508,18 +542,21 @@ async def orchestrator(state: AgentState) -> AgentState:
             "disqualifier_reason": f"Orchestrator failed: {str(e)}",
             "status": "failed",
         }
-    
-    ira_flag = bool(profile.get("ira_eligible", False))
-    nmc_flag = profile.get("climate_zone", "") == "extreme_cold"
+    except BaseException:
+        # Cancelled (job cancel, shutdown): don't leave the Energy Load call running on its own
+        _discard_speculative(speculative_task)
+        raise
 
-    await update_proposal(run_id, {
+    speculative_output = await _await_speculative(speculative_task)
+
+    buffer_proposal_update(run_id, {
         "status": "routing",
         "urgency_score": {"HIGH": 3, "MEDIUM": 2, "MONITOR": 1}.get(
             llm_output.get("priority_tier", "MONITOR"), 1
                 ),        
         })
 
-    await save_agent_decision(
+    buffer_agent_decision(
         run_id=run_id,
         facility_id=facility_id,
         agent_name="orchestrator",
@@ -539,29 +576,25 @@ async def orchestrator(state: AgentState) -> AgentState:
         "ira_credit_flag": ira_flag,
         "nmc_recommended_flag": nmc_flag,
         "priority_tier": llm_output.get("priority_tier", "MONITOR"),
+        "speculative_energy_load_output": speculative_output,
     }
 
 
 
 
-async def energy_load_agent(state: AgentState) -> AgentState:
-    print("Energy Load Agent running...")
-
-    profile = state.get("facility_profile") or {}
-    nmc_flag = state.get("nmc_recommended_flag", False)
-
+def build_energy_load_message(profile: dict, nmc_flag: bool, human_feedback: Optional[str]) -> str:
     feedback_block = ""
-    if state.get("human_feedback"):
+    if human_feedback:
         feedback_block = f"""
     IMPORTANT — The Sustainability Director reviewed a previous analysis and
     requested revision with the following feedback:
-    "{state['human_feedback']}"
+    "{human_feedback}"
 
     Adjust your energy load analysis, product recommendation, and sizing
     accordingly based on this feedback.
     """
 
-    user_message = f"""
+    return f"""
     Analyze this Cummins facility's energy load and diesel runtime profile. 
     Recommend an Accelera BESS configuration to reduce diesel runtime and handle peak demand events.
 
@@ -574,24 +607,26 @@ async def energy_load_agent(state: AgentState) -> AgentState:
     climate risk, confidence, and rationale.
     """
 
+
+async def energy_load_agent(state: AgentState) -> AgentState:
+    print("Energy Load Agent running...")
+
+    profile = state.get("facility_profile") or {}
+    nmc_flag = state.get("nmc_recommended_flag", False)
+    speculative_output = state.get("speculative_energy_load_output")
+
+    user_message = build_energy_load_message(profile, nmc_flag, state.get("human_feedback"))
+
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": ENERGY_LOAD_SYSTEM_PROMPT},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.2,
-        )
-        raw = response.choices[0].message.content.strip()
-        llm_output = extract_json(raw)
-        validated = EnergyLoadOutput(**llm_output)
-        llm_output = validated.model_dump()
+        if speculative_output is not None:
+            llm_output = speculative_output
+        else:
+            llm_output = await run_agent_llm(ENERGY_LOAD_SYSTEM_PROMPT, user_message, EnergyLoadOutput, state)
 
     except Exception as e:
         print(f"Energy Load Agent LLM error: {e}")
-        await update_proposal(state["run_id"], {"status": "failed", "feedback_text": str(e)})
-        await save_agent_decision(
+        buffer_proposal_update(state["run_id"], {"status": "failed", "feedback_text": str(e)})
+        buffer_agent_decision(
             run_id=state["run_id"],
             facility_id=state["facility_id"],
             agent_name="energy_load_agent",
@@ -602,7 +637,7 @@ async def energy_load_agent(state: AgentState) -> AgentState:
         )
         raise RuntimeError(f"Energy Load Agent validation failed: {e}")
 
-    await save_agent_decision(
+    buffer_agent_decision(
         run_id=state["run_id"],
         facility_id=state["facility_id"],
         agent_name="energy_load_agent",
@@ -615,6 +650,7 @@ async def energy_load_agent(state: AgentState) -> AgentState:
     _emit_stage("energy_load_done")
     return {
         **state,
+        "speculative_energy_load_output": None,
         "energy_load_output": llm_output,
         "status": "energy_load_done",
     }
@@ -638,6 +674,9 @@ async def battery_sizing_agent(state: AgentState) -> AgentState:
     accordingly based on this feedback.
     """
 
+    # Deterministic numbers; the LLM only explains them
+    financials = compute_battery_sizing(profile, energy_load_output, bool(ira_flag))
+
     user_message = f"""
     Model the financial case for adding an Accelera BESS at this Cummins facility.
 
@@ -648,30 +687,24 @@ async def battery_sizing_agent(state: AgentState) -> AgentState:
     {json.dumps(energy_load_output, indent = 2, default=str)}
 
     IRA credit flag (apply 30% ITC if true): {ira_flag}
+
+    Pre-computed financials (exact — copy these values into your JSON, do not recalculate):
+    {json.dumps(financials, indent = 2)}
     {feedback_block}
     Calculate all three scenarios, CapEx with IRA adjustment, payback, 
     5-year NPV, and CO2 avoided. Ground the rationale in Destination Zero context.
     """
 
     try:
-        response = client.chat.completions.create(
-            model=LLM_MODEL,
-            messages=[
-                {"role": "system", "content": BATTERY_SIZING_SYSTEM_PROMPT},
-                {"role": "user", "content": user_message},
-            ],
-            temperature=0.2,
+        llm_output = await run_agent_llm(
+            BATTERY_SIZING_SYSTEM_PROMPT, user_message, BatterySizingOutput, state, overrides=financials
         )
-        raw = response.choices[0].message.content.strip()
-        llm_output = extract_json(raw)
-        validated = BatterySizingOutput(**llm_output)
-        llm_output = validated.model_dump()
         
     except Exception as e:
         print(f"Battery Sizing Agent LLM error: {e}")
 
-        await update_proposal(state["run_id"], {"status": "failed", "feedback_text": str(e)})
-        await save_agent_decision(
+        buffer_proposal_update(state["run_id"], {"status": "failed", "feedback_text": str(e)})
+        buffer_agent_decision(
             run_id=state["run_id"],
             facility_id=state["facility_id"],
             agent_name="battery_sizing_agent",
@@ -682,7 +715,7 @@ async def battery_sizing_agent(state: AgentState) -> AgentState:
         )
         raise RuntimeError(f"Battery Sizing Agent validation failed: {e}")
 
-    await save_agent_decision(
+    buffer_agent_decision(
         run_id=state["run_id"],
         facility_id=state["facility_id"],
         agent_name="battery_sizing_agent",
@@ -721,6 +754,8 @@ async def review_node(state: AgentState) -> AgentState:
     priority_tier = state.get("priority_tier", "MONITOR")
     urgency_score = {"HIGH": 3.0, "MEDIUM": 2.0, "MONITOR": 1.0}.get(priority_tier, 1.0)
 
+    # Earlier status patches must land before the draft's pending_review
+    await flush_run_writes(state["run_id"])
     await save_draft_proposal(
         run_id=state["run_id"],
         facility_id=state["facility_id"],
@@ -728,7 +763,7 @@ async def review_node(state: AgentState) -> AgentState:
         urgency_score=urgency_score,
     )
 
-    await save_agent_decision(
+    buffer_agent_decision(
         run_id=state["run_id"],
         facility_id=state["facility_id"],
         agent_name="review_node",
@@ -746,17 +781,66 @@ async def review_node(state: AgentState) -> AgentState:
     }
 
 
+def with_write_buffer(node, final: bool = False):
+    """Flush the run's buffered writes after node: in the background at a node boundary (with an
+    updated_at bump, so the run doesn't look orphaned), synchronously when the run ends here (final, or disqualified) or the node raises."""
+
+    @functools.wraps(node)
+    async def wrapper(state: AgentState) -> AgentState:
+        try:
+            with recording_buffered_runs() as buffered_runs:
+                out = await node(state)
+        except BaseException:
+            for run_id in {state.get("run_id"), *buffered_runs} - {None}:
+                try:
+                    await flush_run_writes(run_id, final=True)
+                except Exception as flush_error:
+                    print(f"Write buffer flush after node failure also failed: {flush_error}")
+            raise
+        if final or out.get("disqualified"):
+            await flush_run_writes(out.get("run_id"), final=True)
+        else:
+            touch_run(out.get("run_id"))
+            schedule_flush(out.get("run_id"))
+        return out
+
+    return wrapper
+
+
+def with_node_instrumentation(name: str, node):
+    """Record node's wall time (and whether it raised) on /metrics, inside a graph.node span."""
+
+    @functools.wraps(node)
+    async def wrapper(state: AgentState) -> AgentState:
+        with tracer.start_as_current_span(
+            f"graph.node {name}", attributes={"graph.node": name, "run.id": state.get("run_id") or ""}
+        ), node_seconds.time(name):
+            return await node(state)
+
+    return wrapper
+
+
 def route_after_orchestrator(state: AgentState) -> str:
     return "end" if state["disqualified"] else "energy_load_agent"
 
 
-def build_graph():
+def build_graph(parallel: bool = GRAPH_PARALLEL_MODE, checkpointer=None):
+    """parallel=True runs the Energy Load LLM call speculatively alongside the orchestrator's.
+    The default checkpointer lets each run pick its durability via configurable.checkpoint_mode."""
     graph = StateGraph(AgentState)
 
-    graph.add_node("orchestrator", orchestrator)
-    graph.add_node("energy_load_agent", energy_load_agent)
-    graph.add_node("battery_sizing_agent", battery_sizing_agent)
-    graph.add_node("review_node", review_node)
+    if parallel:
+        orchestrator_node = functools.partial(orchestrator, speculative_energy_load=True)
+    else:
+        orchestrator_node = orchestrator
+    nodes = {
+        "orchestrator": with_write_buffer(orchestrator_node),
+        "energy_load_agent": with_write_buffer(energy_load_agent),
+        "battery_sizing_agent": with_write_buffer(battery_sizing_agent),
+        "review_node": with_write_buffer(review_node, final=True),
+    }
+    for name, node in nodes.items():
+        graph.add_node(name, with_node_instrumentation(name, node))
 
     graph.set_entry_point("orchestrator")
 
@@ -774,7 +858,4 @@ def build_graph():
     graph.add_edge("battery_sizing_agent", "review_node")
     graph.add_edge("review_node", END)
 
-    return graph.compile(checkpointer = FirestoreCheckpointer())
-
-
-app_graph = build_graph()
\ No newline at end of file
+    return graph.compile(checkpointer=checkpointer or CheckpointRouter())
\ No newline at end of file
@@ -1,11 +1,10 @@
 """
-Unified tools for the graph. Uses MCP when USE_MCP=true, else firestore_tools directly.
-Set USE_MCP=false in .env to bypass MCP if it fails (e.g. TaskGroup errors).
+Unified tools for the graph. Uses MCP when USE_MCP=true, else the native async
+Firestore layer (firestore_async_tools) directly. The flags live in tool_config.
 """
-import asyncio
-import os
+from typing import Any, Dict, List
 
-USE_MCP = os.getenv("USE_MCP", "true").lower() in ("true", "1", "yes")
+from tool_config import MCP_TRANSPORT, USE_MCP
 
 if USE_MCP:
     from mcp_tools import (
@@ -14,34 +13,58 @@ if USE_MCP:
         update_proposal,
         save_draft_proposal,
         save_agent_decision,
+        ToolPipeline,
     )
+
+    async def commit_run_writes(run_id: str, proposal_patch: Dict[str, Any], decisions: List[Dict[str, Any]]):
+        """One execute_batch round trip (one server-side WriteBatch) per flush."""
+        pipe = ToolPipeline()
+        if proposal_patch:
+            pipe.update_proposal(run_id, proposal_patch)
+        for row in decisions:
+            pipe.save_agent_decision(
+                run_id=row["run_id"],
+                facility_id=row["facility_id"],
+                agent_name=row["agent_name"],
+                input_summary=row["input_summary"],
+                output_json=row["output_json"],
+                confidence=row["confidence"],
+                rationale=row["rationale"],
+            )
+        await pipe.execute()
 else:
-    from firestore_tools import (
-        facility_profile_get,
-        proposal_create,
-        proposal_update,
+    from firestore_async_tools import (
+        facility_profile_get as get_facility_profile,
+        proposal_create as create_proposal,
+        proposal_update as update_proposal,
         proposal_save_draft,
         agent_decision_append,
+        commit_run_writes,
     )
 
-    async def get_facility_profile(facility_id: str):
-        return await asyncio.to_thread(facility_profile_get, facility_id)
-
-    async def create_proposal(facility_id: str) -> str:
-        return await asyncio.to_thread(proposal_create, facility_id)
-
-    async def update_proposal(run_id: str, patch: dict):
-        return await asyncio.to_thread(proposal_update, run_id, patch)
-
     async def save_draft_proposal(run_id: str, facility_id: str, proposal_json: dict, urgency_score=None):
-        return await asyncio.to_thread(proposal_save_draft, run_id, facility_id, proposal_json, urgency_score)
+        return await proposal_save_draft(run_id, facility_id, proposal_json, urgency_score)
 
     async def save_agent_decision(
         run_id: str, facility_id: str, agent_name: str,
         input_summary: str, output_json: dict, confidence: str, rationale: str,
     ):
-        return await asyncio.to_thread(
-            agent_decision_append,
+        return await agent_decision_append(
             run_id, facility_id, agent_name,
             input_summary, output_json, confidence, rationale,
         )
+
+
+from profile_cache import profile_cache
+
+_get_facility_profile_uncached = get_facility_profile
+
+
+async def get_facility_profile(facility_id: str):
+    """Read-through: in-memory profile cache first, then the configured backend."""
+    profile = profile_cache.get(facility_id)
+    if profile is None:
+        profile = await _get_facility_profile_uncached(facility_id)
+        if profile:
+            profile_cache.put(profile)
+    return profile
@@ -0,0 +1,233 @@
+"""
+Background job runner for graph runs. A job is admitted (or refused when JOB_QUEUE_MAX jobs are
+already waiting), gets its run_id immediately, and runs on one of JOB_WORKERS worker tasks that
+are independent of any HTTP connection. Progress goes to the job's RunEventLog, so callers follow
+it over SSE (/runs/{run_id}/events) or poll GET /jobs/{run_id}.
+
+Scheduling: higher priority first; within a priority, the user with the fewest running jobs, then
+the one served least recently, so one user's burst can't starve everyone else. FIFO per user.
+
+Single-flight: a job submitted with a key is findable through attach(key) until it finishes, so an
+identical request joins its event log and result instead of starting a second graph.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from run_events import RunEventLog
+from tracing import current_context
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "100"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class Job:
+    def __init__(
+        self,
+        run_id: str,
+        user_id: str,
+        params: Dict[str, Any],
+        priority: int = 0,
+        key: Optional[str] = None,
+    ):
+        self.run_id = run_id
+        self.user_id = user_id
+        self.params = params
+        self.priority = priority
+        self.key = key
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        # Set when cancel() stops a running job (as opposed to the runner shutting down)
+        self.cancel_requested = False
+        self.log = RunEventLog()
+        # The submitting request's trace, so the run's spans join it instead of the worker's
+        self.trace_context = current_context()
+        self.done = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "user_id": self.user_id,
+            "facility_id": self.params.get("facility_id"),
+            "priority": self.priority,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobRunner:
+    """execute(job) runs the graph for a job and returns its result summary."""
+
+    def __init__(
+        self,
+        execute: Callable[[Job], Awaitable[Dict[str, Any]]],
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_QUEUE_MAX,
+        retention_seconds: float = JOB_RETENTION_SECONDS,
+    ):
+        self.execute = execute
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, Job] = {}
+        # single-flight key -> queued or running job
+        self._inflight: Dict[str, Job] = {}
+        self.deduplicated = 0
+        # user_id -> heap of (-priority, seq, job); cancelled jobs are skipped lazily
+        self._queues: Dict[str, List[Tuple[int, int, Job]]] = {}
+        self._queued = 0
+        self._running: Counter = Counter()
+        self._last_served: Dict[str, int] = {}
+        self._seq = itertools.count()
+        self._ticks = itertools.count(1)
+        self._cond = asyncio.Condition()
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for job in self._jobs.values():
+            if job._task is not None and not job._task.done():
+                job._task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def full(self) -> bool:
+        return self._queued >= self.max_queued
+
+    def get(self, run_id: str) -> Optional[Job]:
+        return self._jobs.get(run_id)
+
+    def attach(self, key: str) -> Optional[Job]:
+        """The unfinished job submitted with this key, if any."""
+        job = self._inflight.get(key)
+        if job is not None:
+            self.deduplicated += 1
+        return job
+
+    async def submit(self, job: Job) -> int:
+        """Queue a job; returns how many jobs are waiting (including this one)."""
+        if self.full():
+            raise QueueFullError(f"{self._queued} jobs already queued")
+        self._prune()
+        self._jobs[job.run_id] = job
+        if job.key is not None:
+            self._inflight[job.key] = job
+        heapq.heappush(self._queues.setdefault(job.user_id, []), (-job.priority, next(self._seq), job))
+        self._queued += 1
+        job.log.append({"stage": "queued", "run_id": job.run_id, "position": self._queued})
+        async with self._cond:
+            self._cond.notify()
+        return self._queued
+
+    async def cancel(self, run_id: str) -> bool:
+        """Cancel a queued or running job. False if unknown or already finished."""
+        job = self._jobs.get(run_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return False
+        if job.status == "queued":
+            self._queued -= 1
+            self._finish(job, "cancelled")
+        elif job._task is not None:
+            job.cancel_requested = True
+            job._task.cancel()
+        return True
+
+    def _next_job(self) -> Optional[Job]:
+        best_key, best_user = None, None
+        for user_id, heap in self._queues.items():
+            while heap and heap[0][2].status != "queued":
+                heapq.heappop(heap)
+            if not heap:
+                continue
+            neg_priority, seq, _ = heap[0]
+            key = (neg_priority, self._running[user_id], self._last_served.get(user_id, 0), seq)
+            if best_key is None or key < best_key:
+                best_key, best_user = key, user_id
+        if best_user is None:
+            return None
+        _, _, job = heapq.heappop(self._queues[best_user])
+        self._queued -= 1
+        self._last_served[best_user] = next(self._ticks)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            async with self._cond:
+                while (job := self._next_job()) is None:
+                    await self._cond.wait()
+            await self._run(job)
+
+    async def _run(self, job: Job) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        self._running[job.user_id] += 1
+        job.log.append({"stage": "started", "facility_id": job.params.get("facility_id"), "run_id": job.run_id})
+        # Its own task, so cancelling the job doesn't take the worker down with it
+        job._task = asyncio.create_task(self.execute(job))
+        try:
+            job.result = await asyncio.shield(job._task)
+            self._finish(job, "succeeded", {"stage": "finished", **job.result})
+        except asyncio.CancelledError:
+            if not job.cancel_requested or self._stopping:
+                # The worker itself is being stopped. stop() cancels the job task first, so
+                # job._task.cancelled() can already be true here and can't tell the two apart
+                raise
+            self._finish(job, "cancelled")
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            self._finish(job, "failed", {"stage": "error", "error": job.error})
+        finally:
+            self._running[job.user_id] -= 1
+
+    def _finish(self, job: Job, status: str, evt: Optional[Dict[str, Any]] = None) -> None:
+        if job.key is not None and self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+        job.status = status
+        job.finished_at = time.time()
+        job.log.append(evt or {"stage": status, "run_id": job.run_id})
+        job.log.close()
+        job.done.set()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for run_id in [
+            r for r, job in self._jobs.items()
+            if job.status in FINISHED_STATUSES and job.finished_at < cutoff
+        ]:
+            del self._jobs[run_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self._queued,
+            "running": sum(self._running.values()),
+            "deduplicated": self.deduplicated,
+            "by_status": dict(Counter(job.status for job in self._jobs.values())),
+        }
@@ -0,0 +1,116 @@
+"""
+Shared async LLM client for the graph agents.
+One AsyncOpenAI client (pooled keep-alive HTTP/2 connections) per process, and a
+process-wide semaphore so concurrent runs never exceed LLM_MAX_CONCURRENCY in-flight calls.
+"""
+import asyncio
+import os
+from typing import TYPE_CHECKING, Optional
+
+from metrics import llm_seconds, llm_tokens
+from tracing import tracer
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+LLM_MODEL = "liquid/lfm-2.5-1.2b-thinking:free"
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "90"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))
+
+_client: Optional["AsyncOpenAI"] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_client() -> "AsyncOpenAI":
+    global _client
+    if _client is not None:
+        return _client
+
+    # openai is one of the slowest imports in the app; pay for it on first use, not at startup
+    import httpx
+    from openai import AsyncOpenAI
+
+    http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS,
+            keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+        ),
+        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+    )
+    _client = AsyncOpenAI(
+        base_url=OPENROUTER_BASE_URL,
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        http_client=http_client,
+        max_retries=1,
+    )
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def chat_completion(
+    system_prompt: str,
+    user_message: str,
+    temperature: float = 0.2,
+    model: str = LLM_MODEL,
+    timeout: Optional[float] = None,
+    agent: str = "unknown",
+) -> str:
+    """Run one chat completion without blocking the event loop. Returns the stripped message text.
+    agent labels the call's latency and token counts on /metrics and its llm.chat span."""
+    client = get_client()
+    with tracer.start_as_current_span(
+        "llm.chat",
+        attributes={
+            "gen_ai.operation.name": "chat",
+            "gen_ai.system": "openrouter",
+            "gen_ai.request.model": model,
+            "gen_ai.request.temperature": temperature,
+            "agent": agent,
+        },
+    ) as span:
+        async with _get_semaphore():
+            # Time before this event is spent waiting for an LLM_MAX_CONCURRENCY slot
+            span.add_event("llm.slot_acquired")
+            with llm_seconds.time(agent):
+                response = await client.chat.completions.create(
+                    model=model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_message},
+                    ],
+                    temperature=temperature,
+                    timeout=timeout if timeout is not None else LLM_TIMEOUT_SECONDS,
+                )
+        usage = response.usage
+        if usage is not None:
+            llm_tokens.inc(agent, "prompt", amount=usage.prompt_tokens or 0)
+            llm_tokens.inc(agent, "completion", amount=usage.completion_tokens or 0)
+            span.set_attribute("gen_ai.usage.input_tokens", usage.prompt_tokens or 0)
+            span.set_attribute("gen_ai.usage.output_tokens", usage.completion_tokens or 0)
+        if getattr(response, "model", None):
+            span.set_attribute("gen_ai.response.model", response.model)
+    content = response.choices[0].message.content
+    if content is None:
+        raise RuntimeError("LLM returned an empty response")
+    return content.strip()
+
+
+async def close_client() -> None:
+    """Close pooled connections (call on app shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
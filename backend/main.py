@@ -1,30 +1,94 @@
+# First, so the startup report's "import main" covers every import below
+from startup import IMPORT_STARTED, Lazy, record, register_warmup, report as startup_report, run_warmups, timed
 import os
 import uuid
 from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
-from firestore_tools import proposal_update_decision
+from firestore_tools import init_db
+from firestore_async_tools import (
+    proposal_update_decision,
+    facility_profile_list,
+    proposal_create_rejected_batch,
+    proposal_get,
+    proposal_list_unfinished,
+    proposal_claim_for_resume,
+    proposal_create,
+    proposal_update,
+    facility_profile_get,
+)
+from prescreen import prescreen_profiles
+from profile_cache import PROFILE_CACHE_ENABLED, profile_cache
+from llm_client import close_client, get_client
+from token_cache import token_cache
+from tool_config import MCP_TRANSPORT, USE_MCP
+from mcp_pool import MCP_POOL_SIZE
+from job_runner import FINISHED_STATUSES, Job, JobRunner, QueueFullError
+from run_events import RunEventLog, progress_queue, run_events, sse_frame
+from metrics import render as render_metrics, runs_in_flight
+from opentelemetry import trace
+from tracing import TRACING_ENABLED, TracingMiddleware, init_tracing, shutdown_tracing, tracer
 from dotenv import load_dotenv
-from pydantic import BaseModel
-from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import asyncio
+import hashlib
 import json
-from typing import Optional
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from contextlib import asynccontextmanager
+from typing import Dict, List, Literal, Optional, Tuple
 load_dotenv(dotenv_path=".env")
 
-# Init Firebase (once)
-service_account_path = os.getenv("SERVICE_ACCOUNT_PATH")
-if not service_account_path:
-    raise RuntimeError("SERVICE_ACCOUNT_PATH is not set. Put it in backend/.env")
-
-if not firebase_admin._apps:
-    cred = credentials.Certificate(service_account_path)
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
 
-app = FastAPI()
+def _init_firebase():
+    """Firebase app + sync Firestore client, built on first use (or by the firebase warm-up)."""
+    if not os.getenv("SERVICE_ACCOUNT_PATH"):
+        raise RuntimeError("SERVICE_ACCOUNT_PATH is not set. Put it in backend/.env")
+    return init_db()
+
+
+def _build_app_graph():
+    # graph.py pulls in langgraph, openai and the tool backend, so it isn't imported until now
+    with timed("import graph"):
+        from graph import build_graph
+    return build_graph()
+
+
+firebase = Lazy("firebase", _init_firebase)
+app_graph = Lazy("graph", _build_app_graph)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing here waits on Firebase, the graph or MCP, so /ping answers as soon as the server is
+    # up; warm-up builds them in the background and /ready reports when it's done
+    warmup = asyncio.create_task(run_warmups())
+    cert_refresh = asyncio.create_task(refresh_auth_certs())
+    await job_runner.start()
+    sweeper = asyncio.create_task(resume_sweeper()) if RESUME_SWEEP_ENABLED else None
+    gc_task = asyncio.create_task(checkpoint_gc_loop()) if CHECKPOINT_GC_ENABLED else None
+    yield
+    warmup.cancel()
+    if sweeper is not None:
+        sweeper.cancel()
+    if gc_task is not None:
+        gc_task.cancel()
+    await job_runner.stop()
+    cert_refresh.cancel()
+    if MCP_POOLED:
+        from mcp_pool import mcp_pool
+        await mcp_pool.stop()
+    profile_cache.stop()
+    graph = app_graph.peek()
+    if graph is not None:
+        await asyncio.to_thread(graph.checkpointer.close)
+    await close_client()
+    shutdown_tracing()
+
+
+init_tracing("stern-backend")
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,13 +97,21 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if TRACING_ENABLED:
+    # Added last, so it wraps CORS and the span covers the whole request
+    app.add_middleware(TracingMiddleware)
+
+CheckpointMode = Literal["none", "local", "replicated", "firestore"]
 
 class TestGraphRequest(BaseModel):
     facility_id: str
     run_id: Optional[str] = None
     human_feedback: Optional[str] = None
+    force_rerun: bool = False
+    checkpoint_mode: Optional[CheckpointMode] = None
 
-def verify_bearer_token(authorization: str | None):
+async def verify_bearer_token(authorization: str | None):
+    """Decoded claims for the request's Firebase ID token, verified once per token (token_cache)."""
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization header")
 
@@ -47,9 +119,11 @@ def verify_bearer_token(authorization: str | None):
         raise HTTPException(status_code=401, detail="Invalid Authorization header")
 
     token = authorization.split(" ", 1)[1].strip()
+    # verify_id_token needs the default Firebase app
+    await firebase.aget()
 
     try:
-        decoded = auth.verify_id_token(token)
+        decoded = await token_cache.verify(token)
         return decoded
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -61,15 +135,31 @@ class ProposalDecisionRequest(BaseModel):
 class RunRequest(BaseModel):
     facility_id: str
     human_feedback: str | None = None
+    force_rerun: bool = False
+    # None uses CHECKPOINT_MODE
+    checkpoint_mode: CheckpointMode | None = None
+    # Higher runs first when the job queue is backed up
+    priority: int = Field(default=0, ge=0, le=9)
 
 @app.get("/ping")
 async def ping():
+    """Liveness: the process is up. Says nothing about Firebase or the graph (see /ready)."""
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 503 until the selected warm-up hooks are done. The body is the startup report."""
+    body = startup_report()
+    if not body["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
 @app.get("/test-firebase")
 async def test_firebase():
     # If this runs, Firebase is connected
+    db = await firebase.aget()
     _ = list(db.collection("test").limit(1).stream())
     return {"status": "firebase connected"}
 
@@ -93,20 +183,82 @@ async def test_openrouter():
     return {"response": response.choices[0].message.content}
 
 
-from graph import app_graph, _progress_queue
-from graph_tools import USE_MCP
+from checkpoint_gc import CHECKPOINT_GC_ENABLED, CHECKPOINT_GC_INTERVAL_SECONDS, CheckpointGC
 
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+# Job priority for batch facilities; the default (lowest) lets interactive runs go first
+BATCH_JOB_PRIORITY = int(os.getenv("BATCH_JOB_PRIORITY", "0"))
+# Only stdio servers are pooled; an in-process session is cheap to open per run
+MCP_POOLED = USE_MCP and MCP_TRANSPORT == "stdio" and MCP_POOL_SIZE > 0
+BATCH_CHECKPOINT_MODE = os.getenv("BATCH_CHECKPOINT_MODE", "none").lower()
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("true", "1", "yes")
 
-@app.post("/test-graph")
-async def test_graph(body: TestGraphRequest):
-    run_id = body.run_id or uuid.uuid4().hex
-    init_state = {
-        "facility_id": body.facility_id,
+# Crash recovery: runs left in one of these statuses with a checkpoint can continue from it
+RESUMABLE_STATUSES = ("running", "routing", "energy_load_done", "battery_sizing_done", "failed", "resuming")
+# The sweeper leaves "failed" to manual resume: a failed orchestrator ends the graph, so most
+# failed runs have nothing to continue and would otherwise fill every sweep
+RESUME_SWEEP_STATUSES = tuple(s for s in RESUMABLE_STATUSES if s != "failed")
+RESUME_SWEEP_ENABLED = os.getenv("RESUME_SWEEP_ENABLED", "true").lower() in ("true", "1", "yes")
+# A run untouched for this long is assumed orphaned (its process died), not still working
+RESUME_STALE_AFTER_SECONDS = float(os.getenv("RESUME_STALE_AFTER_SECONDS", "120"))
+# 0 sweeps once at startup only
+RESUME_SWEEP_INTERVAL_SECONDS = float(os.getenv("RESUME_SWEEP_INTERVAL_SECONDS", "300"))
+RESUME_SWEEP_WINDOW_HOURS = float(os.getenv("RESUME_SWEEP_WINDOW_HOURS", "24"))
+RESUME_SWEEP_LIMIT = int(os.getenv("RESUME_SWEEP_LIMIT", "20"))
+RESUME_MAX_ATTEMPTS = int(os.getenv("RESUME_MAX_ATTEMPTS", "3"))
+
+
+checkpoint_gc = Lazy("checkpoint_gc", lambda: CheckpointGC(app_graph.get().checkpointer))
+
+
+def _warm_profile_cache() -> None:
+    warm = profile_cache.start()
+    print(f"Facility profile cache {'warm' if warm else 'still loading'}: {profile_cache.stats()['entries']} profiles")
+
+
+async def _warm_mcp_pool() -> None:
+    from mcp_pool import mcp_pool
+    await mcp_pool.start()
+    print(f"MCP session pool ready: {mcp_pool.stats()}")
+
+
+async def _warm_llm_client() -> None:
+    # The slow part is importing openai; do that on a thread, then build the client on the loop
+    await asyncio.to_thread(__import__, "openai")
+    get_client()
+
+
+# Run in this order by the lifespan (STARTUP_WARMUP picks which); each also happens on first use
+register_warmup("firebase", firebase.get, required=True)
+register_warmup("graph", app_graph.get, required=True)
+if PROFILE_CACHE_ENABLED:
+    register_warmup("profile_cache", _warm_profile_cache)
+if MCP_POOLED:
+    register_warmup("mcp_pool", _warm_mcp_pool)
+register_warmup("llm_client", _warm_llm_client)
+
+
+def run_config(thread_id: str, checkpoint_mode: Optional[str] = None) -> dict:
+    """Graph config for one run. checkpoint_mode None falls back to CHECKPOINT_MODE."""
+    configurable = {"thread_id": thread_id}
+    if checkpoint_mode:
+        configurable["checkpoint_mode"] = checkpoint_mode
+    return {"configurable": configurable}
+
+
+def initial_state(
+    facility_id: str,
+    run_id: Optional[str] = None,
+    human_feedback: Optional[str] = None,
+    force_rerun: bool = False,
+) -> dict:
+    return {
+        "facility_id": facility_id,
         "run_id": run_id,
         "facility_profile": None,
         "energy_load_output": None,
         "battery_sizing_output": None,
-        "human_feedback": body.human_feedback,
+        "human_feedback": human_feedback,
         "final_proposal": None,
         "status": "starting",
         "disqualified": False,
@@ -115,36 +267,208 @@ async def test_graph(body: TestGraphRequest):
         "nmc_recommended_flag": None,
         "priority_tier": None,
         "revision_count": 0,
+        "bypass_llm_cache": force_rerun,
     }
-    if USE_MCP:
-        from mcp_tools import set_mcp_session, clear_mcp_session
-        from mcp.client.stdio import stdio_client, StdioServerParameters, get_default_environment
-        from mcp.client.session import ClientSession
-        import sys
-        _backend_dir = os.path.dirname(os.path.abspath(__file__))
-        _env = {**get_default_environment(), **{k: str(v) for k, v in os.environ.items() if v is not None}}
-        server_params = StdioServerParameters(
-            command=sys.executable,
-            args=[os.path.join(_backend_dir, "mcp_server.py")],
-            env=_env,
-            cwd=_backend_dir,
-        )
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-                set_mcp_session(session)
-                try:
-                    result = await app_graph.ainvoke(
-                        init_state,
-                        config={"configurable": {"thread_id": run_id}},
-                    )
-                finally:
-                    clear_mcp_session()
+
+
+@asynccontextmanager
+async def tool_session():
+    """Provide the graph's tool backend for everything run inside this block: a pooled MCP
+    session when USE_MCP (a one-off server if MCP_POOL_SIZE=0, an in-process one if
+    MCP_TRANSPORT=inprocess), nothing extra otherwise."""
+    if MCP_POOLED:
+        from mcp_pool import mcp_pool
+        async with mcp_pool.session():
+            yield
+    elif USE_MCP:
+        from mcp_tools import open_mcp_session
+        async with open_mcp_session(MCP_TRANSPORT):
+            yield
     else:
-        result = await app_graph.ainvoke(
-            init_state,
-            config={"configurable": {"thread_id": run_id}},
-        )
+        yield
+
+
+def _flatten_exceptions(exc):
+    if hasattr(exc, "exceptions") and getattr(exc, "exceptions", None):
+        out = []
+        for sub in exc.exceptions:
+            out.extend(_flatten_exceptions(sub))
+        return out
+    return [exc]
+
+
+def _error_message(exc: BaseException) -> str:
+    flat = _flatten_exceptions(exc)
+    if flat:
+        return "; ".join(f"{type(x).__name__}: {x}" for x in flat)
+    return str(exc)
+
+
+async def _not_resumable(run_id: str, status: Optional[str], detail: str) -> None:
+    """Refuse with 409, first moving the run to "failed" so the sweeper stops picking it up."""
+    if status != "failed":
+        await proposal_update(run_id, {"status": "failed", "error": detail})
+    raise HTTPException(status_code=409, detail=detail)
+
+
+async def resume_run(
+    run_id: str, user_id: str, stale_after_seconds: Optional[float] = None, priority: int = 0
+) -> dict:
+    """Queue an unfinished run to continue from its last checkpoint. Nodes that already completed
+    are not rerun; LangGraph picks up at the checkpoint's next node(s), reusing any writes that
+    finished in the interrupted step. Raises HTTPException when the run can't be resumed."""
+    proposal = await proposal_get(run_id)
+    if proposal is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    status = proposal.get("status")
+    if status not in RESUMABLE_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Run is {status}, nothing to resume")
+    # Covers resumes too, since they run as jobs; force doesn't skip this one
+    job = job_runner.get(run_id)
+    if job is not None and job.status not in FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Run is {job.status} in this process")
+    updated_at = proposal.get("updated_at")
+    if stale_after_seconds is None:
+        stale_after_seconds = RESUME_STALE_AFTER_SECONDS
+    if stale_after_seconds > 0 and isinstance(updated_at, datetime):
+        if datetime.now(timezone.utc) - updated_at < timedelta(seconds=stale_after_seconds):
+            raise HTTPException(status_code=409, detail="Run was updated recently and may still be running")
+
+    # The run is orphaned from here on, so a run that can never continue is marked failed
+    thread_id = proposal.get("thread_id")
+    checkpoint_mode = proposal.get("checkpoint_mode")
+    if not thread_id or checkpoint_mode == "none":
+        await _not_resumable(run_id, status, "Run was not checkpointed")
+    if int(proposal.get("resume_count", 0)) >= RESUME_MAX_ATTEMPTS:
+        await _not_resumable(run_id, status, "Run is out of resume attempts")
+    graph = await app_graph.aget()
+    snapshot = await graph.aget_state(run_config(thread_id, checkpoint_mode))
+    if not snapshot.values:
+        await _not_resumable(run_id, status, "No checkpoint found for run")
+    if not snapshot.next:
+        await _not_resumable(run_id, status, "Run already reached the end of the graph")
+
+    # Checked before claiming, so a full queue doesn't use up a resume attempt
+    if job_runner.full():
+        raise HTTPException(status_code=429, detail="Too many queued runs, try again shortly")
+    if not await proposal_claim_for_resume(run_id, updated_at, RESUMABLE_STATUSES, RESUME_MAX_ATTEMPTS):
+        raise HTTPException(status_code=409, detail="Run changed or is out of resume attempts")
+
+    resumed_from = list(snapshot.next)
+    print(f"Resuming run {run_id} (thread {thread_id}) at {resumed_from}")
+    params = {
+        "facility_id": proposal.get("facility_id"),
+        "thread_id": thread_id,
+        "checkpoint_mode": checkpoint_mode,
+        "resumed_from": resumed_from,
+    }
+    job = Job(run_id, user_id, params, priority)
+    # Watchers can follow the resumed run on /runs/{run_id}/events
+    run_events.add(run_id, job.log)
+    job.log.append({"stage": "resumed", "run_id": run_id, "resumed_from": resumed_from})
+    try:
+        await job_runner.submit(job)
+    except QueueFullError:
+        # Left "resuming"; the sweeper picks it up again once it goes stale
+        raise HTTPException(status_code=429, detail="Too many queued runs, try again shortly")
+    return {
+        "run_id": run_id,
+        "resumed_from": resumed_from,
+        "status": job.status,
+        "events": f"/runs/{run_id}/events",
+    }
+
+
+async def sweep_unfinished_runs() -> List[dict]:
+    """Queue resumes for recent runs that were left unfinished."""
+    updated_after = datetime.now(timezone.utc) - timedelta(hours=RESUME_SWEEP_WINDOW_HOURS)
+    proposals = await proposal_list_unfinished(RESUME_SWEEP_STATUSES, updated_after, RESUME_SWEEP_LIMIT)
+    resumed = []
+    for proposal in proposals:
+        try:
+            resumed.append(await resume_run(proposal["run_id"], "resume-sweeper"))
+        except HTTPException as e:
+            print(f"Resume sweeper skipped {proposal['run_id']}: {e.detail}")
+        except Exception as e:
+            print(f"Resume sweeper failed on {proposal['run_id']}: {_error_message(e)}")
+    return resumed
+
+
+async def resume_sweeper() -> None:
+    while True:
+        try:
+            resumed = await sweep_unfinished_runs()
+            if resumed:
+                print(f"Resume sweeper queued {len(resumed)} run(s)")
+        except Exception as e:
+            print(f"Resume sweep failed: {_error_message(e)}")
+        if RESUME_SWEEP_INTERVAL_SECONDS <= 0:
+            return
+        await asyncio.sleep(RESUME_SWEEP_INTERVAL_SECONDS)
+
+
+async def refresh_auth_certs() -> None:
+    try:
+        await firebase.aget()
+    except Exception as e:
+        print(f"ID-token signing cert prefetch disabled: {e}")
+        return
+    await token_cache.refresh_certs_loop()
+
+
+async def checkpoint_gc_loop() -> None:
+    while True:
+        try:
+            gc = await checkpoint_gc.aget()
+            await asyncio.to_thread(gc.run_pass)
+        except Exception as e:
+            print(f"Checkpoint GC failed: {_error_message(e)}")
+        await asyncio.sleep(CHECKPOINT_GC_INTERVAL_SECONDS)
+
+
+@app.get("/cache-stats")
+async def cache_stats():
+    from llm_cache import llm_cache
+    # None for pieces nothing has needed yet; reading stats shouldn't build them
+    graph, gc = app_graph.peek(), checkpoint_gc.peek()
+    return {
+        "llm": llm_cache.stats(),
+        "facility_profiles": profile_cache.stats(),
+        "checkpoints": graph.checkpointer.stats() if graph is not None else None,
+        "checkpoint_gc": gc.stats() if gc is not None else None,
+        "run_events": run_events.stats(),
+        "jobs": job_runner.stats(),
+        "auth_tokens": token_cache.stats(),
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape target: node, LLM, Firestore and MCP latencies, token and validation
+    failure counts, and in-flight runs for this process."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/checkpoints/gc")
+async def run_checkpoint_gc(
+    dry_run: bool = False,
+    authorization: str | None = Header(default=None),
+):
+    """Run one compaction pass now and return its report (bytes reclaimed etc.)."""
+    decoded = await verify_bearer_token(authorization)
+    if decoded.get("role") != "sustainability_director":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    gc = await checkpoint_gc.aget()
+    return await asyncio.to_thread(gc.run_pass, dry_run)
+
+
+@app.post("/test-graph")
+async def test_graph(body: TestGraphRequest):
+    run_id = body.run_id or uuid.uuid4().hex
+    job, _ = await _submit_job(body.model_dump(), "test-graph", run_id=run_id)
+    await job.done.wait()
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
 
     return  {
             "facility_id": body.facility_id,
@@ -168,6 +492,7 @@ async def test_graph(body: TestGraphRequest):
 async def setup_roles():
     from firebase_admin import auth
 
+    await firebase.aget()
     users = [
         {"email": "engineer@test.com", "role": "facility_engineer"},
         {"email": "director@test.com", "role": "sustainability_director"},
@@ -186,7 +511,7 @@ async def decide_proposal(
     body: ProposalDecisionRequest,
     authorization: str | None = Header(default=None),
 ):
-    decoded = verify_bearer_token(authorization)
+    decoded = await verify_bearer_token(authorization)
     role = decoded.get("role")
     if role != "sustainability_director":
         raise HTTPException(status_code=403, detail="Forbidden")
@@ -197,7 +522,7 @@ async def decide_proposal(
     allowed_statuses = {"approved", "rejected", "revision_requested"}
     if body.status not in allowed_statuses:
         raise HTTPException(status_code=400, detail="Invalid status")
-    proposal_update_decision(
+    await proposal_update_decision(
         run_id=run_id,
         status=body.status,
         reviewer_uid=reviewer_uid,
@@ -205,125 +530,434 @@ async def decide_proposal(
     )
     return {"ok": True, "run_id": run_id, "status": body.status}
 
+def _sse_response(frames) -> StreamingResponse:
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Connection": "keep-alive",
+        },
+    )
+
+
+async def _follow(log: RunEventLog, after_seq: int = 0):
+    async for seq, evt in log.subscribe(after_seq):
+        yield sse_frame(seq, evt)
+
+
+async def _execute_job(job: Job) -> dict:
+    """JobRunner hook: run the graph for one job, streaming stage events to its log. A job from
+    resume_run() (params carry resumed_from) continues its thread instead of starting one."""
+    params = job.params
+    progress_queue.set(job.log)
+    graph = await app_graph.aget()
+    resumed_from = params.get("resumed_from")
+    attributes = {
+        "run.id": job.run_id,
+        "facility.id": params["facility_id"],
+        "job.priority": job.priority,
+        "job.queued_seconds": round((job.started_at or job.created_at) - job.created_at, 3),
+    }
+    if resumed_from is not None:
+        # None input continues the thread instead of starting a new run
+        graph_input, thread_id = None, params["thread_id"]
+        attributes["graph.resumed_from"] = resumed_from
+    else:
+        graph_input = initial_state(
+            params["facility_id"], job.run_id, params.get("human_feedback"), params.get("force_rerun", False)
+        )
+        thread_id = job.run_id
+    # Parented to the request that submitted the job; queue wait shows up as the gap before it
+    span = tracer.start_as_current_span(
+        "graph.resume" if resumed_from is not None else "graph.run",
+        context=job.trace_context,
+        attributes=attributes,
+    )
+    try:
+        async with tool_session():
+            with span, runs_in_flight.track():
+                result = await graph.ainvoke(
+                    graph_input, config=run_config(thread_id, params.get("checkpoint_mode"))
+                )
+    except asyncio.CancelledError:
+        if job.cancel_requested:
+            # Written here, after the graph unwound and flushed its buffered writes, so a late
+            # "running" patch can't land on top of it and make the run resumable again
+            await proposal_update(job.run_id, {"status": "cancelled"})
+        raise
+    except Exception:
+        import traceback
+
+        traceback.print_exc()
+        raise
+    outcome = {
+        "status": result.get("status"),
+        "disqualified": result.get("disqualified"),
+        "disqualifier_reason": result.get("disqualifier_reason"),
+        "priority_tier": result.get("priority_tier"),
+        "run_id": result.get("run_id"),
+    }
+    if resumed_from is not None:
+        outcome["resumed_from"] = resumed_from
+    return outcome
+
+
+job_runner = JobRunner(_execute_job)
+# single-flight key -> set once that request's job is queued (or admission failed)
+_admitting: Dict[str, asyncio.Event] = {}
+
+
+async def _single_flight_key(params: dict) -> str:
+    """Runs with the same facility, profile contents and feedback would make the same LLM calls.
+    The checkpoint mode is part of the key too, since joiners get the joined run's durability."""
+    facility_id = params["facility_id"]
+    profile = profile_cache.get(facility_id)
+    if profile is None:
+        profile = await facility_profile_get(facility_id)
+    material = json.dumps(
+        [facility_id, profile, params.get("human_feedback"), params.get("checkpoint_mode")],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+async def _submit_job(
+    params: dict, user_id: str, priority: int = 0, run_id: Optional[str] = None
+) -> Tuple[Job, bool]:
+    """Admit a run to the job queue; returns (job, joined). The proposal is created first so the
+    caller gets a run_id (which is also the checkpoint thread_id) before the graph starts.
+    While an identical run is queued or running, returns that job with joined=True instead
+    (single-flight). An explicit run_id (/test-graph) and force_rerun always run: a forced run
+    asks for fresh LLM calls, which joining someone else's run wouldn't give it."""
+    key = None
+    if SINGLE_FLIGHT_ENABLED and run_id is None and not params.get("force_rerun"):
+        key = await _single_flight_key(params)
+        while True:
+            existing = job_runner.attach(key)
+            if existing is not None:
+                print(f"Single-flight: {params['facility_id']} joins in-flight run {existing.run_id}")
+                trace.get_current_span().set_attributes({"run.id": existing.run_id, "run.deduplicated": True})
+                return existing, True
+            admitting = _admitting.get(key)
+            if admitting is None:
+                break
+            # An identical request is creating its proposal right now; join it once it's queued
+            await admitting.wait()
+        _admitting[key] = asyncio.Event()
+    try:
+        if job_runner.full():
+            raise HTTPException(status_code=429, detail="Too many queued runs, try again shortly")
+        run_id = run_id or await proposal_create(params["facility_id"])
+        trace.get_current_span().set_attribute("run.id", run_id)
+        job = Job(run_id, user_id, params, priority, key)
+        run_events.add(run_id, job.log)
+        try:
+            await job_runner.submit(job)
+        except QueueFullError:
+            raise HTTPException(status_code=429, detail="Too many queued runs, try again shortly")
+        return job, False
+    finally:
+        if key is not None:
+            _admitting.pop(key).set()
+
+
+async def _require_runner_role(authorization: str | None) -> dict:
+    decoded = await verify_bearer_token(authorization)
+    role = decoded.get("role")
+    if role not in {"facility_engineer", "sustainability_director"}:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return decoded
+
+
 @app.post("/run")
 async def run_graph_stream(
     body: RunRequest,
     authorization: str | None = Header(default=None),
 ):
-    decoded = verify_bearer_token(authorization)
+    """Queue the run and stream its events. The run continues if the connection drops."""
+    decoded = await _require_runner_role(authorization)
+    job, _ = await _submit_job(body.model_dump(), decoded.get("uid"), body.priority)
+    return _sse_response(_follow(job.log))
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(
+    body: RunRequest,
+    authorization: str | None = Header(default=None),
+):
+    decoded = await _require_runner_role(authorization)
+    job, joined = await _submit_job(body.model_dump(), decoded.get("uid"), body.priority)
+    return {
+        "run_id": job.run_id,
+        "status": job.status,
+        "events": f"/runs/{job.run_id}/events",
+        # True when this request joined an identical run already in flight
+        "deduplicated": joined,
+    }
+
+
+@app.get("/jobs/{run_id}")
+async def get_job(
+    run_id: str,
+    authorization: str | None = Header(default=None),
+):
+    await _require_runner_role(authorization)
+    job = job_runner.get(run_id)
+    if job is not None:
+        return job.to_dict()
+    # Not (or no longer) tracked by this process: report the stored proposal status
+    proposal = await proposal_get(run_id)
+    if proposal is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"run_id": run_id, "status": proposal.get("status"), "facility_id": proposal.get("facility_id")}
+
+
+@app.post("/jobs/{run_id}/cancel")
+async def cancel_job(
+    run_id: str,
+    authorization: str | None = Header(default=None),
+):
+    """Submitter or a director can cancel a queued or running job."""
+    decoded = await _require_runner_role(authorization)
+    job = job_runner.get(run_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.user_id != decoded.get("uid") and decoded.get("role") != "sustainability_director":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    if not await job_runner.cancel(run_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    if job.status == "cancelled":
+        # It was still queued, so no graph will write the proposal
+        await proposal_update(run_id, {"status": "cancelled"})
+    else:
+        # _execute_job marks the proposal once the graph has unwound; report it if that's quick
+        try:
+            await asyncio.wait_for(job.done.wait(), 10)
+        except asyncio.TimeoutError:
+            pass
+    return {"run_id": run_id, "status": job.status}
+
+
+@app.get("/runs/{run_id}/events")
+async def run_events_stream(
+    run_id: str,
+    last_event_id: str | None = Header(default=None),
+    authorization: str | None = Header(default=None),
+):
+    """Follow a run started on this instance. Replays events after Last-Event-ID, then streams live.
+    For a run whose log is gone (finished long ago, or another instance) it sends the stored status."""
+    decoded = await verify_bearer_token(authorization)
     role = decoded.get("role")
     if role not in {"facility_engineer", "sustainability_director"}:
         raise HTTPException(status_code=403, detail="Forbidden")
 
+    log = run_events.get(run_id)
+    if log is None:
+        proposal = await proposal_get(run_id)
+        if proposal is None:
+            raise HTTPException(status_code=404, detail="Run not found")
+
+        async def _stored():
+            yield sse_frame(0, {"stage": "snapshot", "run_id": run_id, "status": proposal.get("status")})
+
+        return _sse_response(_stored())
+    after_seq = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return _sse_response(_follow(log, after_seq))
+
+
+@app.post("/runs/{run_id}/resume", status_code=202)
+async def resume_run_endpoint(
+    run_id: str,
+    force: bool = False,
+    authorization: str | None = Header(default=None),
+):
+    """Queue the resume as a job; follow it on /runs/{run_id}/events or GET /jobs/{run_id}.
+    force skips the recently-updated guard (use when the original process is known to be dead)."""
+    decoded = await verify_bearer_token(authorization)
+    role = decoded.get("role")
+    if role not in {"facility_engineer", "sustainability_director"}:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return await resume_run(run_id, decoded.get("uid"), 0 if force else None)
+
+class BatchRunRequest(BaseModel):
+    # None or ["all"] evaluates every document in facility_profiles
+    facility_ids: List[str] | None = None
+    # How many of this batch's jobs are queued or running at once
+    concurrency: int = 4
+    # Profile field to rank facilities by (highest first); None keeps the given order
+    priority_field: str | None = "monthly_demand_charge_usd"
+    human_feedback: str | None = None
+    force_rerun: bool = False
+    # Batch evaluations are one-shot, so by default they skip checkpoints entirely
+    checkpoint_mode: CheckpointMode | None = None
+
+
+# Job log events that end a run; the batch stream reports these as facility_finished/facility_error
+_TERMINAL_STAGES = ("finished", "error", "cancelled")
+
+
+def _batch_outcome(facility_id: str, job: Job) -> dict:
+    if job.status == "succeeded":
+        return {"stage": "facility_finished", "facility_id": facility_id, **job.result}
+    return {
+        "stage": "facility_error",
+        "facility_id": facility_id,
+        "run_id": job.run_id,
+        "status": job.status,
+        "error": job.error or f"Job {job.status}",
+    }
+
+
+def _order_batch(profiles: List[dict], facility_ids: List[str] | None, priority_field: str | None) -> List[str]:
+    if facility_ids and facility_ids != ["all"]:
+        ordered = list(dict.fromkeys(facility_ids))
+    else:
+        ordered = [p["facility_id"] for p in profiles]
+    if priority_field:
+        by_id = {p["facility_id"]: p for p in profiles}
+
+        def _rank(fid: str) -> float:
+            value = (by_id.get(fid) or {}).get(priority_field)
+            return float(value) if isinstance(value, (int, float)) else float("-inf")
+
+        ordered.sort(key=_rank, reverse=True)
+    return ordered
+
+
+@app.post("/runs/batch")
+async def run_batch_stream(
+    body: BatchRunRequest,
+    authorization: str | None = Header(default=None),
+):
+    decoded = await verify_bearer_token(authorization)
+    role = decoded.get("role")
+    if role not in {"facility_engineer", "sustainability_director"}:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    concurrency = max(1, min(body.concurrency, BATCH_MAX_CONCURRENCY))
+    profiles = profile_cache.all()
+    if profiles is None:
+        profiles = await facility_profile_list()
+    facility_ids = _order_batch(profiles, body.facility_ids, body.priority_field)
+    if not facility_ids:
+        raise HTTPException(status_code=400, detail="No facilities to evaluate")
+
+    # Hard disqualifiers in one vectorized pass; rejects never enter the graph
+    by_id = {p["facility_id"]: p for p in profiles}
+    passed, rejected = prescreen_profiles([by_id.get(fid) or {"facility_id": fid} for fid in facility_ids])
+
+    params = {
+        "human_feedback": body.human_feedback,
+        "force_rerun": body.force_rerun,
+        "checkpoint_mode": body.checkpoint_mode or BATCH_CHECKPOINT_MODE,
+    }
+
     async def event_generator():
-        progress_queue = asyncio.Queue()
-        token = _progress_queue.set(progress_queue)
+        events: asyncio.Queue = asyncio.Queue()
+        outcomes: List[dict] = []
+        followers: List[asyncio.Task] = []
+        started_at = time.monotonic()
+
+        async def _follow_job(facility_id: str, job: Job) -> None:
+            # Read-only: the job runs (and finishes) whether or not anyone is following it
+            async for _, evt in job.log.subscribe():
+                if evt is None or evt.get("stage") in _TERMINAL_STAGES:
+                    continue
+                stage = "facility_started" if evt.get("stage") == "started" else evt.get("stage")
+                events.put_nowait({**evt, "stage": stage, "facility_id": facility_id})
+            outcome = _batch_outcome(facility_id, job)
+            outcomes.append(outcome)
+            events.put_nowait(outcome)
+
+        async def _submit_batch() -> None:
+            # At most `concurrency` of this batch's jobs in the queue at once, so a large fleet
+            # doesn't fill JOB_QUEUE_MAX on its own
+            try:
+                for facility_id in (p["facility_id"] for p in passed):
+                    while len(active := [t for t in followers if not t.done()]) >= concurrency:
+                        await asyncio.wait(active, return_when=asyncio.FIRST_COMPLETED)
+                    try:
+                        job, _ = await _submit_job(
+                            {"facility_id": facility_id, **params}, decoded.get("uid"), BATCH_JOB_PRIORITY
+                        )
+                    except HTTPException as e:
+                        # Queue full (429): report it for this facility and keep going
+                        outcome = {
+                            "stage": "facility_error",
+                            "facility_id": facility_id,
+                            "status": "failed",
+                            "error": e.detail,
+                        }
+                        outcomes.append(outcome)
+                        events.put_nowait(outcome)
+                        continue
+                    followers.append(asyncio.create_task(_follow_job(facility_id, job)))
+                await asyncio.gather(*followers)
+            finally:
+                events.put_nowait(None)
+
+        yield f"data: {json.dumps({'stage': 'batch_started', 'facility_ids': facility_ids, 'concurrency': concurrency})}\n\n"
+        batch_task = asyncio.create_task(_submit_batch())
         try:
-            started_payload = {
-                "stage": "started",
-                "facility_id": body.facility_id,
-            }
-            yield f"data: {json.dumps(started_payload)}\n\n"
-
-            init_state = {
-                "facility_id": body.facility_id,
-                "run_id": None,
-                "facility_profile": None,
-                "energy_load_output": None,
-                "battery_sizing_output": None,
-                "human_feedback": body.human_feedback,
-                "final_proposal": None,
-                "status": "starting",
-                "disqualified": False,
-                "disqualifier_reason": None,
-            }
-
-            thread_id = uuid.uuid4().hex
-            config = {"configurable": {"thread_id": thread_id}}
-            result = {}
-
-            async def _run_graph():
-                nonlocal result
-                if USE_MCP:
-                    import sys
-                    from mcp_tools import set_mcp_session, clear_mcp_session
-                    _backend_dir = os.path.dirname(os.path.abspath(__file__))
-                    from mcp.client.stdio import stdio_client, StdioServerParameters, get_default_environment
-                    from mcp.client.session import ClientSession
-
-                    _env = {**get_default_environment(), **{k: str(v) for k, v in os.environ.items() if v is not None}}
-                    server_params = StdioServerParameters(
-                        command=sys.executable,
-                        args=[os.path.join(_backend_dir, "mcp_server.py")],
-                        env=_env,
-                        cwd=_backend_dir,
-                    )
-                    async with stdio_client(server_params) as (read, write):
-                        async with ClientSession(read, write) as session:
-                            set_mcp_session(session)
-                            try:
-                                result.update(await app_graph.ainvoke(init_state, config=config))
-                            finally:
-                                clear_mcp_session()
-                else:
-                    result.update(await app_graph.ainvoke(init_state, config=config))
-
-            graph_task = asyncio.create_task(_run_graph())
-
-            while not graph_task.done():
-                try:
-                    evt = await asyncio.wait_for(progress_queue.get(), timeout=0.3)
-                    yield f"data: {json.dumps(evt)}\n\n"
-                except asyncio.TimeoutError:
-                    pass
-
-            # Drain any remaining progress events
-            while not progress_queue.empty():
-                try:
-                    evt = progress_queue.get_nowait()
-                    yield f"data: {json.dumps(evt)}\n\n"
-                except asyncio.QueueEmpty:
+            if rejected:
+                run_ids = await proposal_create_rejected_batch(
+                    [
+                        {
+                            "facility_id": profile["facility_id"],
+                            "reason": rule.reason,
+                            "input_summary": rule.input_summary,
+                            "rationale": rule.rationale,
+                        }
+                        for profile, rule in rejected
+                    ],
+                )
+                for (profile, rule), run_id in zip(rejected, run_ids):
+                    outcome = {
+                        "stage": "facility_finished",
+                        "facility_id": profile["facility_id"],
+                        "run_id": run_id,
+                        "status": "disqualified",
+                        "disqualified": True,
+                        "disqualifier_reason": rule.reason,
+                        "priority_tier": None,
+                        "prescreened": True,
+                    }
+                    outcomes.append(outcome)
+                    yield f"data: {json.dumps(outcome)}\n\n"
+
+            while True:
+                evt = await events.get()
+                if evt is None:
                     break
-
-            await graph_task
-            finished_payload = {
-                "stage": "finished",
-                "status": result.get("status"),
-                "disqualified": result.get("disqualified"),
-                "run_id": result.get("run_id"),
+                yield f"data: {json.dumps(evt, default=str)}\n\n"
+            await batch_task
+
+            summary = {
+                "stage": "fleet_summary",
+                "total": len(facility_ids),
+                "completed": len(outcomes),
+                "by_status": dict(Counter(o.get("status") for o in outcomes)),
+                "by_priority_tier": dict(
+                    Counter(o["priority_tier"] for o in outcomes if o.get("priority_tier"))
+                ),
+                "elapsed_seconds": round(time.monotonic() - started_at, 2),
             }
-            yield f"data: {json.dumps(finished_payload)}\n\n"
-        finally:
-            _progress_queue.reset(token)
-
+            yield f"data: {json.dumps(summary)}\n\n"
         except Exception as e:
             import traceback
 
-            def _flatten_exceptions(exc):
-                if hasattr(exc, "exceptions") and getattr(exc, "exceptions", None):
-                    out = []
-                    for sub in exc.exceptions:
-                        out.extend(_flatten_exceptions(sub))
-                    return out
-                return [exc]
-
-            err_msg = str(e)
-            flat = _flatten_exceptions(e)
-            if flat:
-                err_msg = "; ".join(f"{type(x).__name__}: {x}" for x in flat)
             traceback.print_exc()
-            error_payload = {
-                "stage": "error",
-                "error": err_msg,
-            }
-            yield f"data: {json.dumps(error_payload)}\n\n"
+            yield f"data: {json.dumps({'stage': 'error', 'error': _error_message(e)})}\n\n"
+        finally:
+            # A disconnect stops submitting the rest; jobs already submitted run to completion
+            for task in (batch_task, *followers):
+                if not task.done():
+                    task.cancel()
 
-    return StreamingResponse(
-        event_generator(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive",
-        },
-    )
\ No newline at end of file
+    return _sse_response(event_generator())
+
+
+record("import main", time.perf_counter() - IMPORT_STARTED)
@@ -0,0 +1,183 @@
+"""
+Pool of long-lived MCP sessions to warm mcp_server.py workers.
+Each worker owns one stdio subprocess and ClientSession for its whole life (restarted if it
+crashes), so runs check out an already-initialized session instead of spawning a server.
+
+    async with mcp_pool.session():
+        await app_graph.ainvoke(...)   # mcp_tools calls use the checked-out session
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+# mcp_tools is imported where it is used, so main can read MCP_POOL_SIZE without loading it
+from mcp_read_cache import MCP_READ_CACHE_TTL_SECONDS
+
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "4"))
+MCP_POOL_START_TIMEOUT_SECONDS = float(os.getenv("MCP_POOL_START_TIMEOUT_SECONDS", "30"))
+MCP_POOL_PING_TIMEOUT_SECONDS = float(os.getenv("MCP_POOL_PING_TIMEOUT_SECONDS", "5"))
+# Idle sessions older than this are pinged before being handed out
+MCP_POOL_HEALTH_CHECK_AFTER_SECONDS = float(os.getenv("MCP_POOL_HEALTH_CHECK_AFTER_SECONDS", "30"))
+MCP_POOL_RESTART_BACKOFF_SECONDS = 1.0
+# Each worker has its own read cache and a write through one doesn't invalidate the others, so
+# their read-cache TTL is capped at this (0 turns their cache off)
+MCP_POOL_READ_CACHE_TTL_SECONDS = float(os.getenv("MCP_POOL_READ_CACHE_TTL_SECONDS", "2"))
+_WORKER_ENV = {"MCP_READ_CACHE_TTL_SECONDS": str(min(MCP_READ_CACHE_TTL_SECONDS, MCP_POOL_READ_CACHE_TTL_SECONDS))}
+if MCP_POOL_READ_CACHE_TTL_SECONDS <= 0:
+    _WORKER_ENV["MCP_READ_CACHE_ENABLED"] = "false"
+
+
+class MCPWorker:
+    def __init__(self, index: int):
+        self.index = index
+        self.session = None
+        self.restarts = 0
+        self.last_ok_at = 0.0
+        self._ready = asyncio.Event()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"mcp-worker-{self.index}")
+
+    async def _run(self) -> None:
+        # stdio_client/ClientSession must be entered and exited in this same task
+        from mcp.client.session import ClientSession
+        from mcp.client.stdio import stdio_client
+        from mcp_tools import mcp_server_params
+
+        while not self._stopping:
+            try:
+                async with stdio_client(mcp_server_params(_WORKER_ENV)) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await session.initialize()
+                        self.session = session
+                        self.last_ok_at = time.monotonic()
+                        self._ready.set()
+                        await self._wake.wait()
+            except Exception as e:
+                print(f"MCP worker {self.index} exited: {e}")
+            finally:
+                self.session = None
+                self._ready.clear()
+                self._wake.clear()
+            if not self._stopping:
+                self.restarts += 1
+                await asyncio.sleep(MCP_POOL_RESTART_BACKOFF_SECONDS)
+
+    async def wait_ready(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def restart(self) -> None:
+        """Tear the subprocess down; _run brings a fresh one up."""
+        if self.session is not None:
+            self._wake.set()
+        self.session = None
+        self._ready.clear()
+
+    async def stop(self) -> None:
+        self._stopping = True
+        self._wake.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, MCP_POOL_START_TIMEOUT_SECONDS)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+            self._task = None
+
+    async def healthy(self) -> bool:
+        if self.session is None:
+            return False
+        if time.monotonic() - self.last_ok_at < MCP_POOL_HEALTH_CHECK_AFTER_SECONDS:
+            return True
+        try:
+            await asyncio.wait_for(self.session.send_ping(), MCP_POOL_PING_TIMEOUT_SECONDS)
+        except Exception as e:
+            print(f"MCP worker {self.index} failed health check: {e}")
+            return False
+        self.last_ok_at = time.monotonic()
+        return True
+
+
+class MCPSessionPool:
+    def __init__(self, size: int = MCP_POOL_SIZE):
+        self.size = max(1, size)
+        self.workers: List[MCPWorker] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+        self.checkouts = 0
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    async def start(self) -> None:
+        async with self._start_lock:
+            if self.started:
+                return
+            self.workers = [MCPWorker(i) for i in range(self.size)]
+            for worker in self.workers:
+                worker.start()
+            await asyncio.gather(*(w.wait_ready(MCP_POOL_START_TIMEOUT_SECONDS) for w in self.workers))
+            self._idle = asyncio.Queue()
+            for worker in self.workers:
+                self._idle.put_nowait(worker)
+
+    async def stop(self) -> None:
+        await asyncio.gather(*(w.stop() for w in self.workers), return_exceptions=True)
+        self.workers = []
+        self._idle = None
+
+    async def _checkout(self) -> MCPWorker:
+        if not self.started:
+            await self.start()
+        worker = await self._idle.get()
+        try:
+            for _ in range(2):
+                if await worker.wait_ready(MCP_POOL_START_TIMEOUT_SECONDS) and await worker.healthy():
+                    return worker
+                worker.restart()
+            raise RuntimeError(f"MCP worker {worker.index} is not healthy after restart")
+        except BaseException:
+            self._idle.put_nowait(worker)
+            raise
+
+    @asynccontextmanager
+    async def session(self):
+        """Check out a warm session, install it for mcp_tools, and return it afterwards."""
+        from mcp_tools import clear_mcp_session, set_mcp_session
+
+        worker = await self._checkout()
+        self.checkouts += 1
+        set_mcp_session(worker.session)
+        try:
+            yield worker.session
+            worker.last_ok_at = time.monotonic()
+        except BaseException:
+            # The session may be what failed; make the next checkout ping it first
+            worker.last_ok_at = 0.0
+            raise
+        finally:
+            clear_mcp_session()
+            self._idle.put_nowait(worker)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "started": self.started,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "ready": sum(1 for w in self.workers if w.session is not None),
+            "restarts": sum(w.restarts for w in self.workers),
+            "checkouts": self.checkouts,
+        }
+
+
+mcp_pool = MCPSessionPool()
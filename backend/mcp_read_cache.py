@@ -0,0 +1,110 @@
+"""
+Read cache for the MCP server's get_facility_profile, get_proposal and get_pending_proposals tools.
+Write tools invalidate the entries they touch; the TTL bounds staleness from writers that bypass
+the MCP server (e.g. the FastAPI decision endpoint writing to Firestore directly).
+
+The cache is per server process. Under the stdio pool (mcp_pool) a write through one worker
+doesn't invalidate the others, and the app's own firestore_async_tools writes (resume, cancel,
+checkpoint GC) invalidate none of them, so pooled workers run with a shorter TTL
+(MCP_POOL_READ_CACHE_TTL_SECONDS).
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+MCP_READ_CACHE_ENABLED = os.getenv("MCP_READ_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+MCP_READ_CACHE_TTL_SECONDS = float(os.getenv("MCP_READ_CACHE_TTL_SECONDS", "30"))
+MCP_READ_CACHE_MAX_ENTRIES = int(os.getenv("MCP_READ_CACHE_MAX_ENTRIES", "1024"))
+
+PENDING_KEY = ("pending",)
+
+
+def profile_key(facility_id: str) -> Tuple[str, str]:
+    return ("profile", facility_id)
+
+
+def proposal_key(run_id: str) -> Tuple[str, str]:
+    return ("proposal", run_id)
+
+
+class ToolReadCache:
+    """LRU with TTL. Only touched from the server's event loop, so no lock."""
+
+    def __init__(
+        self,
+        enabled: bool = MCP_READ_CACHE_ENABLED,
+        ttl_seconds: float = MCP_READ_CACHE_TTL_SECONDS,
+        max_entries: int = MCP_READ_CACHE_MAX_ENTRIES,
+    ):
+        self.enabled = enabled
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        # Bumped by every invalidation. A read that started before an invalidation must not
+        # store its (possibly pre-write) result.
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(hit, value). value may legitimately be an empty list."""
+        if not self.enabled:
+            return False, None
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if time.monotonic() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Hashable, value: Any, epoch: int) -> None:
+        if not self.enabled or value is None or epoch != self.epoch:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable) -> None:
+        self.epoch += 1
+        self.invalidations += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def invalidate_facility_proposals(self, facility_id: str) -> None:
+        """Drop every cached proposal for a facility (superseding touches all of them)."""
+        stale = [
+            key for key, (_, value) in self._entries.items()
+            if key[0] == "proposal" and isinstance(value, dict) and value.get("facility_id") == facility_id
+        ]
+        self.invalidate(PENDING_KEY, *stale)
+
+    def pending_contains(self, run_id: str) -> bool:
+        entry = self._entries.get(PENDING_KEY)
+        return entry is not None and any(p.get("run_id") == run_id for p in entry[1])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.epoch += 1
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+read_cache = ToolReadCache()
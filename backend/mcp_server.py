@@ -1,10 +1,14 @@
 import os
-# Ensure .env loads from backend directory when run as subprocess
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
+if __name__ == "__main__":
+    # Ensure .env loads from backend directory when run as subprocess
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+import asyncio
 from typing import Any, Dict, List, Optional
 
 from mcp.server.fastmcp import FastMCP
+from opentelemetry.trace import SpanKind
 
 from firestore_tools import (
     facility_profile_get,
@@ -16,76 +20,145 @@ from firestore_tools import (
     proposal_update_decision,
     proposal_list_pending,
     agent_decision_append,
+    execute_write_batch,
 )
-
-mcp = FastMCP("stern-firestore-mcp")
-
-
-@mcp.tool()
-def ping_tool() -> Dict[str, bool]:
+from mcp_read_cache import PENDING_KEY, profile_key, proposal_key, read_cache
+from tracing import extract_context, init_tracing, tracer
+
+
+class TracedFastMCP(FastMCP):
+    """FastMCP whose tool calls continue the caller's trace, carried in the request's _meta
+    by mcp_tools._call_tool."""
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        try:
+            meta = self.get_context().request_context.meta
+        except (LookupError, ValueError):
+            meta = None
+        carrier = (meta.model_extra or {}) if meta is not None else None
+        with tracer.start_as_current_span(
+            f"mcp.tool {name}",
+            context=extract_context(carrier),
+            kind=SpanKind.SERVER,
+            attributes={"mcp.tool": name},
+        ):
+            return await super().call_tool(name, arguments)
+
+
+mcp = TracedFastMCP("stern-firestore-mcp")
+
+# Tools are async and push the blocking Firestore calls onto a thread, so the server's event
+# loop (the app's own loop when mounted in-process, see mcp_tools.open_mcp_session) never blocks.
+# structured_output=False: results go back as JSON text only (what mcp_tools parses), which skips
+# the per-call output-schema validation on both server and client.
+# Read tools are served from mcp_read_cache; write tools invalidate what they touch.
+
+
+async def _cached_read(key, fn, *args):
+    hit, value = read_cache.get(key)
+    if hit:
+        return value
+    epoch = read_cache.epoch
+    value = await asyncio.to_thread(fn, *args)
+    read_cache.put(key, value, epoch)
+    return value
+
+
+def _invalidate_for(tool: str, args: Dict[str, Any]) -> None:
+    if tool == "upsert_facility_profile":
+        read_cache.invalidate(profile_key(args["facility_id"]))
+    elif tool == "save_draft_proposal":
+        # Also supersedes the facility's older pending proposals
+        read_cache.invalidate(proposal_key(args["run_id"]))
+        read_cache.invalidate_facility_proposals(args["facility_id"])
+    elif tool == "update_proposal":
+        run_id = args["run_id"]
+        keys = [proposal_key(run_id)]
+        if {"status", "urgency_score"} & set(args["patch"]) or read_cache.pending_contains(run_id):
+            keys.append(PENDING_KEY)
+        read_cache.invalidate(*keys)
+    elif tool == "update_proposal_status":
+        # Approve/reject supersedes sibling proposals we may not have cached a facility_id for
+        read_cache.clear()
+
+
+@mcp.tool(structured_output=False)
+async def ping_tool() -> Dict[str, bool]:
     return {"ok": True}
 
 
-@mcp.tool()
-def get_facility_profile(facility_id: str) -> Optional[Dict[str, Any]]:
-    return facility_profile_get(facility_id)
+@mcp.tool(structured_output=False)
+async def get_facility_profile(facility_id: str) -> Optional[Dict[str, Any]]:
+    return await _cached_read(profile_key(facility_id), facility_profile_get, facility_id)
 
 
-@mcp.tool()
-def upsert_facility_profile(facility_id: str, patch: Dict[str, Any]) -> Dict[str, bool]:
-    facility_profile_upsert(facility_id, patch)
+@mcp.tool(structured_output=False)
+async def upsert_facility_profile(facility_id: str, patch: Dict[str, Any]) -> Dict[str, bool]:
+    try:
+        await asyncio.to_thread(facility_profile_upsert, facility_id, patch)
+    finally:
+        _invalidate_for("upsert_facility_profile", {"facility_id": facility_id})
     return {"ok": True}
 
 
-@mcp.tool()
-def create_proposal(facility_id: str) -> Dict[str, str]:
-    run_id = proposal_create(facility_id)
+@mcp.tool(structured_output=False)
+async def create_proposal(facility_id: str) -> Dict[str, str]:
+    run_id = await asyncio.to_thread(proposal_create, facility_id)
     return {"run_id": run_id}
 
 
-@mcp.tool()
-def get_proposal(run_id: str) -> Optional[Dict[str, Any]]:
-    return proposal_get(run_id)
+@mcp.tool(structured_output=False)
+async def get_proposal(run_id: str) -> Optional[Dict[str, Any]]:
+    return await _cached_read(proposal_key(run_id), proposal_get, run_id)
 
 
-@mcp.tool()
-def save_draft_proposal(
+@mcp.tool(structured_output=False)
+async def save_draft_proposal(
     run_id: str,
     facility_id: str,
     proposal_json: Dict[str, Any],
     urgency_score: Optional[float] = None,
 ) -> Dict[str, bool]:
-    proposal_save_draft(run_id, facility_id, proposal_json, urgency_score)
+    try:
+        await asyncio.to_thread(proposal_save_draft, run_id, facility_id, proposal_json, urgency_score)
+    finally:
+        _invalidate_for("save_draft_proposal", {"run_id": run_id, "facility_id": facility_id})
     return {"ok": True}
 
 
-@mcp.tool()
-def update_proposal(
+@mcp.tool(structured_output=False)
+async def update_proposal(
     run_id: str,
     patch: Dict[str, Any],
 ) -> Dict[str, bool]:
-    proposal_update(run_id, patch)
+    try:
+        await asyncio.to_thread(proposal_update, run_id, patch)
+    finally:
+        _invalidate_for("update_proposal", {"run_id": run_id, "patch": patch})
     return {"ok": True}
 
 
-@mcp.tool()
-def update_proposal_status(
+@mcp.tool(structured_output=False)
+async def update_proposal_status(
     run_id: str,
     status: str,
     reviewer_uid: str,
     feedback_text: Optional[str] = None,
 ) -> Dict[str, bool]:
-    proposal_update_decision(run_id, status, reviewer_uid, feedback_text)
+    try:
+        await asyncio.to_thread(proposal_update_decision, run_id, status, reviewer_uid, feedback_text)
+    finally:
+        _invalidate_for("update_proposal_status", {"run_id": run_id})
     return {"ok": True}
 
 
-@mcp.tool()
-def get_pending_proposals() -> List[Dict[str, Any]]:
-    return proposal_list_pending()
+@mcp.tool(structured_output=False)
+async def get_pending_proposals() -> List[Dict[str, Any]]:
+    return await _cached_read(PENDING_KEY, proposal_list_pending)
 
 
-@mcp.tool()
-def save_agent_decision(
+@mcp.tool(structured_output=False)
+async def save_agent_decision(
     run_id: str,
     facility_id: str,
     agent_name: str,
@@ -94,7 +167,8 @@ def save_agent_decision(
     confidence: str,
     rationale: str,
 ) -> Dict[str, bool]:
-    agent_decision_append(
+    await asyncio.to_thread(
+        agent_decision_append,
         run_id=run_id,
         facility_id=facility_id,
         agent_name=agent_name,
@@ -106,5 +180,29 @@ def save_agent_decision(
     return {"ok": True}
 
 
+@mcp.tool(structured_output=False)
+async def execute_batch(operations: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Run an ordered list of write operations ({"tool": ..., "args": {...}}) in one Firestore
+    batch. Supports create_proposal, update_proposal, upsert_facility_profile,
+    save_draft_proposal and save_agent_decision. Returns {"results": [...]} in operation order."""
+    try:
+        results = await asyncio.to_thread(execute_write_batch, operations)
+    finally:
+        for op in operations:
+            try:
+                _invalidate_for(op.get("tool"), op.get("args") or {})
+            except (KeyError, TypeError):
+                # Malformed op (the batch itself rejected it); drop everything to be safe
+                read_cache.clear()
+    return {"results": results}
+
+
+
+@mcp.tool(structured_output=False)
+async def get_read_cache_stats() -> Dict[str, Any]:
+    return read_cache.stats()
+
+
 if __name__ == "__main__":
+    init_tracing("stern-mcp-server")
     mcp.run()
\ No newline at end of file
@@ -3,10 +3,18 @@ MCP tool wrappers for the graph. The graph calls these instead of firestore_tool
 Requires mcp_session to be set via set_mcp_session() before running the graph.
 """
 import json
+import logging
 import os
+import sys
+from contextlib import asynccontextmanager
 from contextvars import ContextVar
 from typing import Any, Dict, List, Optional
 
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+from metrics import mcp_tool_seconds
+from tracing import inject_meta, tracer
+
 _mcp_session: ContextVar[Any] = ContextVar("mcp_session", default=None)
 
 
@@ -28,6 +36,20 @@ def _get_session():
     return s
 
 
+async def _call_tool(name: str, arguments: Dict[str, Any]):
+    """call_tool on the current session, timed per tool for /metrics. The trace context rides in
+    the request's _meta so the server's span joins this trace."""
+    session = _get_session()
+    with tracer.start_as_current_span(
+        f"mcp {name}", kind=SpanKind.CLIENT, attributes={"mcp.tool": name}
+    ) as span, mcp_tool_seconds.time(name):
+        # meta=None (tracing off) sends no _meta; the argument needs mcp>=1.19
+        result = await session.call_tool(name, arguments, meta=inject_meta())
+        if result.isError:
+            span.set_status(Status(StatusCode.ERROR))
+        return result
+
+
 def _parse_result(result) -> Any:
     """Parse CallToolResult to Python object."""
     if result.isError:
@@ -47,21 +69,18 @@ def _parse_result(result) -> Any:
 
 
 async def get_facility_profile(facility_id: str) -> Optional[Dict[str, Any]]:
-    session = _get_session()
-    result = await session.call_tool("get_facility_profile", {"facility_id": facility_id})
+    result = await _call_tool("get_facility_profile", {"facility_id": facility_id})
     return _parse_result(result)
 
 
 async def create_proposal(facility_id: str) -> str:
-    session = _get_session()
-    result = await session.call_tool("create_proposal", {"facility_id": facility_id})
+    result = await _call_tool("create_proposal", {"facility_id": facility_id})
     data = _parse_result(result)
     return data.get("run_id") if isinstance(data, dict) else None
 
 
 async def update_proposal(run_id: str, patch: Dict[str, Any]) -> None:
-    session = _get_session()
-    await session.call_tool("update_proposal", {"run_id": run_id, "patch": patch})
+    await _call_tool("update_proposal", {"run_id": run_id, "patch": patch})
 
 
 async def save_draft_proposal(
@@ -70,11 +89,10 @@ async def save_draft_proposal(
     proposal_json: Dict[str, Any],
     urgency_score: Optional[float] = None,
 ) -> None:
-    session = _get_session()
     args = {"run_id": run_id, "facility_id": facility_id, "proposal_json": proposal_json}
     if urgency_score is not None:
         args["urgency_score"] = urgency_score
-    await session.call_tool("save_draft_proposal", args)
+    await _call_tool("save_draft_proposal", args)
 
 
 async def save_agent_decision(
@@ -86,8 +104,7 @@ async def save_agent_decision(
     confidence: str,
     rationale: str,
 ) -> None:
-    session = _get_session()
-    await session.call_tool(
+    await _call_tool(
         "save_agent_decision",
         {
             "run_id": run_id,
@@ -99,3 +116,129 @@ async def save_agent_decision(
             "rationale": rationale,
         },
     )
+
+
+async def execute_batch(operations: List[Dict[str, Any]]) -> List[Any]:
+    """Send several write operations in one call_tool round trip; results come back in order."""
+    result = await _call_tool("execute_batch", {"operations": operations})
+    data = _parse_result(result)
+    return data.get("results", []) if isinstance(data, dict) else []
+
+
+class ToolPipeline:
+    """Collects write calls and sends them as one execute_batch request.
+
+        pipe = ToolPipeline()
+        pipe.update_proposal(run_id, patch)
+        pipe.save_agent_decision(...)
+        results = await pipe.execute()
+    """
+
+    def __init__(self):
+        self.operations: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.operations)
+
+    def _add(self, tool: str, args: Dict[str, Any]) -> "ToolPipeline":
+        self.operations.append({"tool": tool, "args": args})
+        return self
+
+    def create_proposal(self, facility_id: str) -> "ToolPipeline":
+        return self._add("create_proposal", {"facility_id": facility_id})
+
+    def update_proposal(self, run_id: str, patch: Dict[str, Any]) -> "ToolPipeline":
+        return self._add("update_proposal", {"run_id": run_id, "patch": patch})
+
+    def upsert_facility_profile(self, facility_id: str, patch: Dict[str, Any]) -> "ToolPipeline":
+        return self._add("upsert_facility_profile", {"facility_id": facility_id, "patch": patch})
+
+    def save_draft_proposal(
+        self,
+        run_id: str,
+        facility_id: str,
+        proposal_json: Dict[str, Any],
+        urgency_score: Optional[float] = None,
+    ) -> "ToolPipeline":
+        args = {"run_id": run_id, "facility_id": facility_id, "proposal_json": proposal_json}
+        if urgency_score is not None:
+            args["urgency_score"] = urgency_score
+        return self._add("save_draft_proposal", args)
+
+    def save_agent_decision(
+        self,
+        run_id: str,
+        facility_id: str,
+        agent_name: str,
+        input_summary: str,
+        output_json: Dict[str, Any],
+        confidence: str,
+        rationale: str,
+    ) -> "ToolPipeline":
+        return self._add(
+            "save_agent_decision",
+            {
+                "run_id": run_id,
+                "facility_id": facility_id,
+                "agent_name": agent_name,
+                "input_summary": input_summary,
+                "output_json": output_json,
+                "confidence": confidence,
+                "rationale": rationale,
+            },
+        )
+
+    async def execute(self) -> List[Any]:
+        if not self.operations:
+            return []
+        operations, self.operations = self.operations, []
+        return await execute_batch(operations)
+
+
+def mcp_server_params(extra_env: Optional[Dict[str, str]] = None):
+    """stdio launch parameters for mcp_server.py, inheriting this process's environment
+    (extra_env overrides it)."""
+    from mcp.client.stdio import StdioServerParameters, get_default_environment
+
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    env = {**get_default_environment(), **{k: str(v) for k, v in os.environ.items() if v is not None}}
+    env.update(extra_env or {})
+    return StdioServerParameters(
+        command=sys.executable,
+        args=[os.path.join(backend_dir, "mcp_server.py")],
+        env=env,
+        cwd=backend_dir,
+    )
+
+
+@asynccontextmanager
+async def open_mcp_session(transport: str = "stdio"):
+    """Open an initialized ClientSession and install it for the current context.
+    transport="stdio" spawns mcp_server.py; "inprocess" mounts its FastMCP tools on this
+    event loop over memory streams (same tool calls, no subprocess or pipe)."""
+    from mcp.client.session import ClientSession
+
+    if transport == "inprocess":
+        from mcp.shared.memory import create_connected_server_and_client_session
+        from mcp_server import mcp
+
+        # The server logs every request at INFO; fine on a subprocess's stderr, noisy in the app's log
+        logging.getLogger("mcp.server.lowlevel.server").setLevel(logging.WARNING)
+        async with create_connected_server_and_client_session(mcp) as session:
+            set_mcp_session(session)
+            try:
+                yield session
+            finally:
+                clear_mcp_session()
+        return
+
+    from mcp.client.stdio import stdio_client
+
+    async with stdio_client(mcp_server_params()) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            set_mcp_session(session)
+            try:
+                yield session
+            finally:
+                clear_mcp_session()
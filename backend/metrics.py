@@ -0,0 +1,205 @@
+"""
+Process metrics for GET /metrics, in the Prometheus text exposition format.
+
+A small in-process registry rather than prometheus_client: counters, one gauge and fixed-bucket
+histograms keyed by label values. Recording is a dict lookup, a bisect and a few adds under an
+uncontended lock, so the hooks stay on the hot path (every node, LLM call and Firestore/MCP call).
+Rendering happens only when /metrics is scraped.
+
+Histograms are timed with .time(*labels); their last label is always outcome ("ok" or "error").
+"""
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("true", "1", "yes")
+
+# Seconds. LLM calls and whole nodes take seconds to minutes; Firestore and MCP calls milliseconds
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}" for labels, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track(self, *labels: str):
+        """Up by one for the duration of the block."""
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = SLOW_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *labels: str):
+        """Observe the block's duration under labels + (outcome,)."""
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            self.observe(time.perf_counter() - started, *labels, outcome)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = [(labels, list(counts), total, n) for labels, (counts, total, n) in self._values.items()]
+        lines = []
+        for labels, counts, total, n in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = _labels(self.labelnames + ("le",), labels + (_number(bound),))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {n}")
+        return lines
+
+
+def timed_calls(histogram: Histogram) -> Callable:
+    """Decorator: time every call of a sync or async function under its own name."""
+
+    def decorate(fn):
+        name = fn.__name__
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with histogram.time(name):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with histogram.time(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def render() -> str:
+    """Every registered metric in the text exposition format (version 0.0.4)."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+node_seconds = Histogram(
+    "graph_node_duration_seconds", "Wall time of one graph node, including its write-buffer flush.",
+    ("node", "outcome"),
+)
+llm_seconds = Histogram(
+    "llm_request_duration_seconds", "Latency of one chat completion (after the concurrency limit).",
+    ("agent", "outcome"),
+)
+llm_tokens = Counter("llm_tokens_total", "Tokens reported by the LLM provider.", ("agent", "kind"))
+validation_failures = Counter(
+    "llm_output_validation_failures_total",
+    "LLM outputs rejected by their Pydantic output model (reason: json or schema).",
+    ("model", "reason"),
+)
+firestore_seconds = Histogram(
+    "firestore_operation_duration_seconds", "Latency of one firestore_tools / firestore_async_tools call.",
+    ("operation", "outcome"), FAST_BUCKETS,
+)
+mcp_tool_seconds = Histogram(
+    "mcp_tool_call_duration_seconds", "Latency of one MCP call_tool round trip.",
+    ("tool", "outcome"), FAST_BUCKETS,
+)
+runs_in_flight = Gauge("graph_runs_in_flight", "Graph runs currently executing in this process.")
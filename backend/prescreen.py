@@ -0,0 +1,69 @@
+"""
+Hard disqualifier rules shared by the orchestrator and the fleet pre-screen.
+The orchestrator checks one profile with check_disqualifiers(); batch runs screen every
+profile in one vectorized pass with prescreen_profiles() and never send rejects into the graph.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class DisqualifierRule(NamedTuple):
+    field: str
+    minimum: float
+    reason: str
+    rationale: str
+
+    @property
+    def input_summary(self) -> str:
+        return f"{self.field}<{self.minimum:g}"
+
+
+# Checked in order; the first failing rule is the one reported
+DISQUALIFIER_RULES: Tuple[DisqualifierRule, ...] = (
+    DisqualifierRule(
+        "annual_diesel_runtime_hours", 200,
+        "Emergency-Only — Low Priority", "Below minimum diesel runtime threshold.",
+    ),
+    DisqualifierRule(
+        "monthly_demand_charge_usd", 2000,
+        "Low Demand Charge — Monitor", "Below minimum demand charge threshold.",
+    ),
+    DisqualifierRule(
+        "facility_power_load_kw", 100,
+        "Below Minimum Scale", "Below minimum facility load threshold.",
+    ),
+)
+
+_THRESHOLDS = np.array([rule.minimum for rule in DISQUALIFIER_RULES], dtype=np.float64)
+
+
+def check_disqualifiers(profile: Dict[str, Any]) -> Optional[DisqualifierRule]:
+    for rule in DISQUALIFIER_RULES:
+        if (profile.get(rule.field) or 0) < rule.minimum:
+            return rule
+    return None
+
+
+def prescreen_profiles(
+    profiles: Sequence[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], DisqualifierRule]]]:
+    """Split profiles into (passed, [(rejected profile, failing rule)]) in one pass.
+    Missing fields count as 0, same as check_disqualifiers."""
+    if not profiles:
+        return [], []
+
+    values = np.array(
+        [[float(p.get(rule.field) or 0) for rule in DISQUALIFIER_RULES] for p in profiles],
+        dtype=np.float64,
+    )
+    fails = values < _THRESHOLDS
+    rejected_mask = fails.any(axis=1)
+    first_failed = fails.argmax(axis=1)
+
+    passed = [p for p, rejected in zip(profiles, rejected_mask.tolist()) if not rejected]
+    rejected = [
+        (profiles[i], DISQUALIFIER_RULES[first_failed[i]])
+        for i in np.flatnonzero(rejected_mask).tolist()
+    ]
+    return passed, rejected
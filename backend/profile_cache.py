@@ -0,0 +1,187 @@
+"""
+In-process read-through cache of facility_profiles.
+Warmed at startup from the whole collection and kept fresh by a Firestore on_snapshot
+listener, so graph runs and batch runs read profiles from memory.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from firestore_tools import init_db
+
+PROFILE_CACHE_ENABLED = os.getenv("PROFILE_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+# If the listener has been down longer than this, reads bypass the cache until it recovers
+PROFILE_CACHE_MAX_STALENESS_SECONDS = float(os.getenv("PROFILE_CACHE_MAX_STALENESS_SECONDS", "300"))
+PROFILE_CACHE_WARM_TIMEOUT_SECONDS = float(os.getenv("PROFILE_CACHE_WARM_TIMEOUT_SECONDS", "15"))
+PROFILE_CACHE_RESTART_INTERVAL_SECONDS = 30.0
+
+
+class FacilityProfileCache:
+    def __init__(self):
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = None
+        # Set by start(), cleared by stop(); a failed restart leaves _watch None but keeps this
+        self._running = False
+        # The next snapshot is a new watch's first one and carries the whole collection
+        self._full_load = False
+        self.last_snapshot_at: Optional[float] = None
+        # Guards attaching/detaching the watch between start(), stop() and the supervisor thread
+        self._watch_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    # -- listener -----------------------------------------------------------
+
+    def start(self, wait: bool = True) -> bool:
+        """Attach the snapshot listener. The first snapshot loads every profile.
+        Returns True once warm (or immediately when wait=False)."""
+        self._running = True
+        self._stopped.clear()
+        if self._supervisor is None or not self._supervisor.is_alive():
+            # Started first, so it retries if attaching below fails
+            self._supervisor = threading.Thread(target=self._supervise, name="profile-cache-supervisor", daemon=True)
+            self._supervisor.start()
+        with self._watch_lock:
+            if self._watch is None:
+                self._attach()
+        if wait:
+            return self._ready.wait(PROFILE_CACHE_WARM_TIMEOUT_SECONDS)
+        return True
+
+    def stop(self) -> None:
+        self._running = False
+        self._stopped.set()
+        with self._watch_lock:
+            if self._watch is not None:
+                self._watch.unsubscribe()
+                self._watch = None
+        self._ready.clear()
+
+    def _attach(self) -> None:
+        # Caller holds _watch_lock
+        db = init_db()
+        with self._lock:
+            self._full_load = True
+        self._watch = db.collection("facility_profiles").on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time) -> None:
+        # Runs on the listener's background thread
+        with self._lock:
+            if self._full_load:
+                # Also after a restart: a profile deleted while the listener was down has no
+                # REMOVED change coming, so the first snapshot replaces everything
+                self._profiles = {doc.id: self._with_id(doc.id, doc.to_dict()) for doc in docs}
+                self._full_load = False
+            else:
+                for change in changes:
+                    doc = change.document
+                    if change.type.name == "REMOVED":
+                        self._profiles.pop(doc.id, None)
+                    else:
+                        self._profiles[doc.id] = self._with_id(doc.id, doc.to_dict())
+            self.last_snapshot_at = time.time()
+        self._ready.set()
+
+    @staticmethod
+    def _with_id(facility_id: str, data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        out = dict(data or {})
+        out["facility_id"] = facility_id
+        return out
+
+    def listener_active(self) -> bool:
+        return self._watch is not None and self._watch.is_active()
+
+    def _supervise(self) -> None:
+        """Every PROFILE_CACHE_RESTART_INTERVAL_SECONDS, reattach a listener that died or whose
+        last restart failed. On its own thread: unsubscribe() joins the old consumer thread and
+        init_db()/on_snapshot() block, none of which may run on the event loop."""
+        while not self._stopped.wait(PROFILE_CACHE_RESTART_INTERVAL_SECONDS):
+            if self.listener_active():
+                continue
+            with self._watch_lock:
+                if not self._running:
+                    return
+                if self._watch is not None:
+                    try:
+                        self._watch.unsubscribe()
+                    except Exception:
+                        pass
+                    self._watch = None
+                try:
+                    self._attach()
+                except Exception as e:
+                    print(f"Facility profile listener restart failed: {e}")
+
+    def is_usable(self) -> bool:
+        """Only reads state; reattaching a dead listener is the supervisor thread's job."""
+        if not self._ready.is_set():
+            return False
+        if self.listener_active():
+            return True
+        return self.last_snapshot_at is not None and (
+            time.time() - self.last_snapshot_at <= PROFILE_CACHE_MAX_STALENESS_SECONDS
+        )
+
+    # -- reads --------------------------------------------------------------
+
+    def get(self, facility_id: str) -> Optional[Dict[str, Any]]:
+        """Cached profile, or None on a miss (caller falls back to a Firestore read)."""
+        if not self.is_usable():
+            self.misses += 1
+            return None
+        with self._lock:
+            profile = self._profiles.get(facility_id)
+        if profile is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(profile)
+
+    def get_many(self, facility_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Profiles found in cache, keyed by facility_id. Missing IDs are left out."""
+        out: Dict[str, Dict[str, Any]] = {}
+        for facility_id in facility_ids:
+            profile = self.get(facility_id)
+            if profile is not None:
+                out[facility_id] = profile
+        return out
+
+    def all(self) -> Optional[List[Dict[str, Any]]]:
+        """Every cached profile, or None if the cache can't be trusted right now."""
+        if not self.is_usable():
+            return None
+        with self._lock:
+            return [dict(p) for p in self._profiles.values()]
+
+    def put(self, profile: Dict[str, Any]) -> None:
+        """Read-through fill after a miss; the listener overwrites it on the next change."""
+        if not self._ready.is_set() or not profile.get("facility_id"):
+            return
+        with self._lock:
+            self._profiles[profile["facility_id"]] = dict(profile)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        age = None if self.last_snapshot_at is None else round(time.time() - self.last_snapshot_at, 3)
+        active = self.listener_active()
+        return {
+            "entries": len(self._profiles),
+            "warm": self._ready.is_set(),
+            "listener_active": active,
+            "last_snapshot_age_seconds": age,
+            # Active listener: changes arrive within listener delivery latency. Otherwise the
+            # cache can be as stale as the last snapshot, and is bypassed past the limit.
+            "max_staleness_seconds": 0.0 if active else age,
+            "staleness_limit_seconds": PROFILE_CACHE_MAX_STALENESS_SECONDS,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
+
+
+profile_cache = FacilityProfileCache()
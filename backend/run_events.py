@@ -0,0 +1,119 @@
+"""
+Per-run event log behind the /run SSE streams. Each run appends its stage events to a bounded
+ring buffer with increasing sequence ids; any number of subscribers (the tab that started the run,
+a director watching it, a client reconnecting with Last-Event-ID) replay from a sequence id and
+are then woken as new events arrive, with no polling.
+
+Logs live in this process only and are dropped RUN_EVENTS_RETENTION_SECONDS after the run ends.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple
+
+RUN_EVENTS_MAX_EVENTS = int(os.getenv("RUN_EVENTS_MAX_EVENTS", "256"))
+RUN_EVENTS_RETENTION_SECONDS = float(os.getenv("RUN_EVENTS_RETENTION_SECONDS", "600"))
+RUN_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("RUN_EVENTS_HEARTBEAT_SECONDS", "15"))
+
+# Where graph nodes emit stage events for the current run: a RunEventLog, or anything with
+# put_nowait. Lives here rather than in graph.py so main can set it without importing the graph.
+progress_queue: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("progress_queue", default=None)
+
+
+class RunEventLog:
+    """Append-only ring buffer of (seq, event). Only touched from the event loop, so no lock."""
+
+    def __init__(self, max_events: int = RUN_EVENTS_MAX_EVENTS):
+        self._events: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=max_events)
+        self.next_seq = 1
+        self.closed_at: Optional[float] = None
+        self._changed = asyncio.Event()
+
+    @property
+    def closed(self) -> bool:
+        return self.closed_at is not None
+
+    def append(self, evt: Dict[str, Any]) -> int:
+        seq = self.next_seq
+        self.next_seq += 1
+        self._events.append((seq, evt))
+        self._wake()
+        return seq
+
+    # Lets the log stand in for progress_queue
+    put_nowait = append
+
+    def close(self) -> None:
+        if self.closed_at is None:
+            self.closed_at = time.monotonic()
+            self._wake()
+
+    def _wake(self) -> None:
+        # Wake everyone waiting on the current event; later waiters get a fresh one
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def since(self, after_seq: int) -> List[Tuple[int, Dict[str, Any]]]:
+        """Retained events after after_seq. Events that fell off the ring are skipped."""
+        return [(seq, evt) for seq, evt in self._events if seq > after_seq]
+
+    async def subscribe(
+        self,
+        after_seq: int = 0,
+        heartbeat_seconds: float = RUN_EVENTS_HEARTBEAT_SECONDS,
+    ) -> AsyncIterator[Tuple[Optional[int], Optional[Dict[str, Any]]]]:
+        """Yield (seq, event) from after_seq on until the log closes; (None, None) marks a heartbeat."""
+        while True:
+            pending = self.since(after_seq)
+            for seq, evt in pending:
+                yield seq, evt
+                after_seq = seq
+            if pending:
+                continue
+            if self.closed:
+                return
+            changed = self._changed
+            try:
+                await asyncio.wait_for(changed.wait(), heartbeat_seconds)
+            except asyncio.TimeoutError:
+                yield None, None
+
+
+class RunEventHub:
+    """run_id -> RunEventLog for runs started (or recently finished) in this process."""
+
+    def __init__(self, retention_seconds: float = RUN_EVENTS_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._logs: Dict[str, RunEventLog] = {}
+
+    def add(self, run_id: str, log: RunEventLog) -> None:
+        self._evict()
+        self._logs[run_id] = log
+
+    def get(self, run_id: str) -> Optional[RunEventLog]:
+        self._evict()
+        return self._logs.get(run_id)
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.retention_seconds
+        for run_id in [r for r, log in self._logs.items() if log.closed and log.closed_at < cutoff]:
+            del self._logs[run_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": len(self._logs),
+            "active": sum(1 for log in self._logs.values() if not log.closed),
+        }
+
+
+run_events = RunEventHub()
+
+
+def sse_frame(seq: Optional[int], evt: Optional[Dict[str, Any]]) -> str:
+    """One SSE frame; a (None, None) heartbeat becomes a comment line that clients ignore."""
+    if evt is None:
+        return ": heartbeat\n\n"
+    return f"id: {seq}\ndata: {json.dumps(evt, default=str)}\n\n"
@@ -1,4 +1,4 @@
-from graph import app_graph
+from graph import build_graph
 
 if __name__ == "__main__":
     facility_id = "demo_facility"
@@ -16,5 +16,5 @@ if __name__ == "__main__":
         "disqualifier_reason": None,
     }
 
-    out = app_graph.invoke(init_state)
+    out = build_graph().invoke(init_state)
     print(out)
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""
+Cold-start bookkeeping. The expensive singletons (Firebase app + Firestore client, the compiled
+graph with its checkpointer, the LLM client) are built on first use through Lazy, which records
+how long each build took. Warm-up hooks can build them in the background right after startup, so
+/ping answers as soon as the process is up while /ready stays 503 until the required ones exist.
+
+report() is the startup timeline: main's own import, every lazy build and every warm-up hook.
+For a per-module import breakdown run `python -X importtime -c "import main"`.
+"""
+import asyncio
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar
+
+# Comma-separated warm-up hooks to run at startup; "all" runs every registered hook, "" none
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "all").lower()
+# A failed required hook is retried after 1s, then twice as long each time up to this
+STARTUP_RETRY_MAX_SECONDS = float(os.getenv("STARTUP_RETRY_MAX_SECONDS", "60"))
+STARTUP_RETRY_INITIAL_SECONDS = 1.0
+
+IMPORT_STARTED = time.perf_counter()
+
+T = TypeVar("T")
+
+# phase name -> seconds, in the order they happened
+_phases: Dict[str, float] = {}
+_phases_lock = threading.Lock()
+
+
+def record(name: str, seconds: float) -> None:
+    with _phases_lock:
+        _phases[name] = round(seconds, 3)
+
+
+@contextmanager
+def timed(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+class Lazy(Generic[T]):
+    """A singleton built by factory() on first get(). A failed build is retried on the next get()."""
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._built = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._built
+
+    def peek(self) -> Optional[T]:
+        """The value if it has been built, else None (never builds)."""
+        return self._value
+
+    def get(self) -> T:
+        if self._built:
+            return self._value
+        with self._lock:
+            if not self._built:
+                with timed(self.name):
+                    self._value = self.factory()
+                self._built = True
+        return self._value
+
+    async def aget(self) -> T:
+        """get() for async callers: a first build runs on a worker thread, off the event loop."""
+        if self._built:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+
+class _Warmup:
+    def __init__(self, name: str, fn: Callable[[], Any], required: bool):
+        self.name = name
+        self.fn = fn
+        self.required = required
+        self.status = "pending"
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.attempts = 0
+
+
+_warmups: Dict[str, _Warmup] = {}
+# The hooks STARTUP_WARMUP selected; None until run_warmups() starts
+_active: Optional[List[_Warmup]] = None
+
+
+def register_warmup(name: str, fn: Callable[[], Any], required: bool = False) -> None:
+    """fn may be sync (runs on a worker thread) or async. /ready waits for selected required
+    hooks to succeed; optional ones only have to finish, since their work also happens on demand."""
+    _warmups[name] = _Warmup(name, fn, required)
+
+
+def _selected() -> List[_Warmup]:
+    if STARTUP_WARMUP == "all":
+        return list(_warmups.values())
+    names = {n.strip() for n in STARTUP_WARMUP.split(",") if n.strip()}
+    unknown = names - set(_warmups)
+    if unknown:
+        print(f"Unknown STARTUP_WARMUP hooks ignored: {', '.join(sorted(unknown))}")
+    return [w for w in _warmups.values() if w.name in names]
+
+
+async def _run(warmup: _Warmup) -> None:
+    warmup.status = "running"
+    warmup.attempts += 1
+    started = time.perf_counter()
+    try:
+        if inspect.iscoroutinefunction(warmup.fn):
+            await warmup.fn()
+        else:
+            await asyncio.to_thread(warmup.fn)
+        warmup.status = "done"
+        warmup.error = None
+    except Exception as e:
+        warmup.status = "failed"
+        warmup.error = f"{type(e).__name__}: {e}"
+        print(f"Warm-up {warmup.name} failed: {warmup.error}")
+    warmup.seconds = round(time.perf_counter() - started, 3)
+
+
+async def run_warmups() -> None:
+    """Run the selected hooks in registration order and print the startup report. Then retry
+    failed required hooks with backoff, so a transient error at boot doesn't keep /ready at 503
+    for the life of the process (an unready instance gets no traffic to rebuild them)."""
+    global _active
+    _active = _selected()
+    for warmup in _active:
+        await _run(warmup)
+    timeline = dict(report()["phases"])
+    for warmup in _active:
+        timeline.setdefault(warmup.name, warmup.seconds)
+    print("Startup: " + ", ".join(f"{name} {seconds}s" for name, seconds in timeline.items()))
+
+    retry_after = STARTUP_RETRY_INITIAL_SECONDS
+    while failed := [w for w in _active if w.required and w.status == "failed"]:
+        await asyncio.sleep(retry_after)
+        retry_after = min(retry_after * 2, STARTUP_RETRY_MAX_SECONDS)
+        for warmup in failed:
+            await _run(warmup)
+            if warmup.status == "done":
+                print(f"Warm-up {warmup.name} succeeded on attempt {warmup.attempts}")
+
+
+def is_ready() -> bool:
+    if _active is None:
+        return False
+    for warmup in _active:
+        if warmup.status in ("pending", "running"):
+            return False
+        if warmup.required and warmup.status != "done":
+            return False
+    return True
+
+
+def report() -> Dict[str, Any]:
+    with _phases_lock:
+        phases = dict(_phases)
+    return {
+        "ready": is_ready(),
+        "uptime_seconds": round(time.perf_counter() - IMPORT_STARTED, 3),
+        "phases": phases,
+        "warmups": {
+            w.name: {
+                "required": w.required,
+                "status": w.status,
+                "attempts": w.attempts,
+                "seconds": w.seconds,
+                "error": w.error,
+            }
+            for w in _active or []
+        },
+    }
@@ -0,0 +1,110 @@
+"""
+Cached Firebase ID-token verification for the API's Bearer tokens.
+
+auth.verify_id_token checks an RSA signature and, when its cached copy of Google's signing certs
+has expired, fetches them over HTTP. Here a verified token's claims are kept (keyed by the token's
+sha256, never the token itself) until the token's own exp, so the frontend's repeated calls with
+the same token verify once. Misses verify on a worker thread, and a background loop refreshes the
+signing certs ahead of time so no request waits on that fetch.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from firebase_admin import auth
+
+AUTH_TOKEN_CACHE_ENABLED = os.getenv("AUTH_TOKEN_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+AUTH_TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_TOKEN_CACHE_MAX_ENTRIES", "4096"))
+# Google rotates the keys every few hours and serves them with a max-age of about that long
+AUTH_CERT_REFRESH_SECONDS = float(os.getenv("AUTH_CERT_REFRESH_SECONDS", "1800"))
+
+
+class TokenVerificationCache:
+    def __init__(
+        self,
+        enabled: bool = AUTH_TOKEN_CACHE_ENABLED,
+        max_entries: int = AUTH_TOKEN_CACHE_MAX_ENTRIES,
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        # token sha256 -> (exp, claims)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.cert_refreshes = 0
+        self.last_cert_refresh: Optional[float] = None
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            exp, claims = entry
+            if time.time() >= exp:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def _put(self, key: str, claims: Dict[str, Any]) -> None:
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._entries[key] = (float(exp), claims)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Decoded claims for a valid token; raises whatever auth.verify_id_token raises otherwise.
+        Returns a copy, so callers can't alter the cached claims."""
+        if not self.enabled:
+            return await asyncio.to_thread(auth.verify_id_token, token)
+        key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        claims = self._get(key)
+        if claims is not None:
+            self.hits += 1
+            return dict(claims)
+        self.misses += 1
+        claims = await asyncio.to_thread(auth.verify_id_token, token)
+        self._put(key, dict(claims))
+        return claims
+
+    def refresh_certs(self) -> None:
+        """Fetch Google's ID-token signing certs through the verifier's own HTTP cache, so the next
+        verification finds them fresh. Uses firebase_admin internals; failures only get logged."""
+        try:
+            from firebase_admin import _token_gen
+
+            verifier = auth._get_client(None)._token_verifier
+            verifier.request(url=_token_gen.ID_TOKEN_CERT_URI, method="GET")
+            self.cert_refreshes += 1
+            self.last_cert_refresh = time.time()
+        except Exception as e:
+            print(f"ID-token signing cert prefetch failed: {e}")
+
+    async def refresh_certs_loop(self) -> None:
+        while True:
+            await asyncio.to_thread(self.refresh_certs)
+            await asyncio.sleep(AUTH_CERT_REFRESH_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "cert_refreshes": self.cert_refreshes,
+            "last_cert_refresh": self.last_cert_refresh,
+        }
+
+
+token_cache = TokenVerificationCache()
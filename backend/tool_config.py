@@ -0,0 +1,12 @@
+"""
+Which tool backend the graph talks to. Kept out of graph_tools, which imports the chosen backend
+as soon as it loads, so main can read these flags without pulling in mcp_tools or the graph.
+Set USE_MCP=false in .env to bypass MCP if it fails (e.g. TaskGroup errors).
+"""
+import os
+
+USE_MCP = os.getenv("USE_MCP", "true").lower() in ("true", "1", "yes")
+# "stdio" runs mcp_server.py as a subprocess; "inprocess" mounts its tools on the app's event loop
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio").lower()
+if MCP_TRANSPORT not in ("stdio", "inprocess"):
+    raise ValueError(f"MCP_TRANSPORT must be 'stdio' or 'inprocess', got {MCP_TRANSPORT!r}")
@@ -0,0 +1,151 @@
+"""
+OpenTelemetry tracing. One trace per run:
+  HTTP request (TracingMiddleware)
+    -> graph.run (main; parented to the request although a job worker executes it)
+      -> graph.node <name> -> llm.chat, mcp <tool> -> mcp.tool <tool> (in mcp_server, across the
+         stdio pipe via the call's _meta) -> firestore <operation>, checkpoint.<op>
+
+TRACING_EXPORTER picks where spans go:
+  none    default; the OpenTelemetry API's no-op tracer, and the decorators don't wrap at all
+  console span JSON on stderr (stdout is the MCP server's protocol channel)
+  file    one span JSON per line, appended to TRACING_FILE_PATH (backend/traces.jsonl); the app
+          and the MCP server share the file
+  otlp    OTLP/gRPC to OTEL_EXPORTER_OTLP_ENDPOINT (default localhost:4317)
+"""
+import functools
+import inspect
+import os
+import sys
+from typing import Any, Callable, Dict, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+TRACING_EXPORTERS = ("none", "console", "file", "otlp")
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none").lower()
+if TRACING_EXPORTER not in TRACING_EXPORTERS:
+    raise ValueError(f"TRACING_EXPORTER must be one of {TRACING_EXPORTERS}, got {TRACING_EXPORTER!r}")
+TRACING_ENABLED = TRACING_EXPORTER != "none"
+# Default is absolute so the app and the MCP subprocess (which chdirs to backend/) share one file
+TRACING_FILE_PATH = os.getenv(
+    "TRACING_FILE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "traces.jsonl")
+)
+
+tracer = trace.get_tracer("stern.backend")
+
+_provider = None
+
+
+def init_tracing(service_name: str) -> None:
+    """Install the SDK tracer provider for TRACING_EXPORTER (once per process)."""
+    global _provider
+    if not TRACING_ENABLED or _provider is not None:
+        return
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+
+        exporter = OTLPSpanExporter()
+    elif TRACING_EXPORTER == "file":
+        # Line-buffered append, so each span is one write and two processes don't interleave lines
+        out = open(TRACING_FILE_PATH, "a", buffering=1, encoding="utf-8")
+        exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    else:
+        exporter = ConsoleSpanExporter(out=sys.stderr)
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    # stderr: on the stdio MCP server, stdout carries the protocol
+    print(f"Tracing {service_name} to {TRACING_EXPORTER}", file=sys.stderr)
+
+
+def shutdown_tracing() -> None:
+    """Flush buffered spans (the provider also does this at interpreter exit)."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+def current_context() -> otel_context.Context:
+    """The caller's trace context, to parent work that runs later on another task."""
+    return otel_context.get_current()
+
+
+def inject_meta() -> Optional[Dict[str, str]]:
+    """traceparent/tracestate for the current span, or None when there is nothing to propagate."""
+    carrier: Dict[str, str] = {}
+    propagate.inject(carrier)
+    return carrier or None
+
+
+def extract_context(carrier: Optional[Dict[str, Any]]) -> otel_context.Context:
+    return propagate.extract(carrier or {})
+
+
+def traced_calls(prefix: str, attributes: Optional[Dict[str, Any]] = None) -> Callable:
+    """Decorator: a "<prefix> <function name>" span around every call of a sync or async function.
+    With tracing off it returns the function unchanged."""
+
+    def decorate(fn):
+        if not TRACING_ENABLED:
+            return fn
+        name = f"{prefix} {fn.__name__}"
+        span_attributes = {"code.function": fn.__name__, **(attributes or {})}
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.start_as_current_span(name, attributes=span_attributes):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name, attributes=span_attributes):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+class TracingMiddleware:
+    """Server span per HTTP request, continuing the caller's traceparent header if it sends one.
+    Pure ASGI rather than BaseHTTPMiddleware, so a streamed (SSE) response is covered to the end."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers") or []}
+        method = scope.get("method", "GET")
+        with tracer.start_as_current_span(
+            f"{method} {scope.get('path')}",
+            context=extract_context(headers),
+            kind=SpanKind.SERVER,
+            attributes={"http.request.method": method, "url.path": scope.get("path")},
+        ) as span:
+
+            async def traced_send(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, traced_send)
+            finally:
+                # Set by FastAPI once the request is routed; names the span by its template
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.update_name(f"{method} {route}")
+                    span.set_attribute("http.route", route)
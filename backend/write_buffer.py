@@ -0,0 +1,148 @@
+"""
+Per-run write buffer for proposal patches and agent decision rows.
+Nodes record writes without awaiting Firestore; repeated proposal patches are merged and
+decision rows appended, then committed together (one WriteBatch, via execute_batch when USE_MCP is on) at
+node boundaries in the background, and synchronously at run end or on failure.
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from graph_tools import commit_run_writes
+
+
+class RunWriteBuffer:
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.proposal_patch: Dict[str, Any] = {}
+        self.decisions: List[Dict[str, Any]] = []
+        self._lock = asyncio.Lock()
+
+    def update_proposal(self, patch: Dict[str, Any]) -> None:
+        self.proposal_patch.update(patch)
+
+    def append_decision(self, row: Dict[str, Any]) -> None:
+        self.decisions.append(row)
+
+    def is_empty(self) -> bool:
+        return not self.proposal_patch and not self.decisions
+
+    async def flush(self) -> None:
+        # Lock is FIFO, so commits land in the order flushes were requested
+        async with self._lock:
+            if self.is_empty():
+                return
+            patch, decisions = self.proposal_patch, self.decisions
+            self.proposal_patch, self.decisions = {}, []
+            try:
+                await commit_run_writes(self.run_id, patch, decisions)
+            except Exception:
+                # Put the writes back (ahead of anything newer) so a later flush can retry them
+                self.proposal_patch = {**patch, **self.proposal_patch}
+                self.decisions = decisions + self.decisions
+                raise
+
+
+_buffers: Dict[str, RunWriteBuffer] = {}
+_inflight: Dict[str, Set["asyncio.Task[None]"]] = {}
+# Set by recording_buffered_runs() around a node
+_buffered_runs: ContextVar[Optional[Set[str]]] = ContextVar("buffered_runs", default=None)
+
+
+@contextmanager
+def recording_buffered_runs() -> Iterator[Set[str]]:
+    """Yields the set of run_ids the block buffers writes under. A node's state may not carry
+    the run_id yet (a batch run's orchestrator creates the proposal), so a failing node flushes
+    these rather than trusting state["run_id"]."""
+    runs: Set[str] = set()
+    token = _buffered_runs.set(runs)
+    try:
+        yield runs
+    finally:
+        _buffered_runs.reset(token)
+
+
+def _buffer(run_id: str) -> RunWriteBuffer:
+    runs = _buffered_runs.get()
+    if runs is not None:
+        runs.add(run_id)
+    buf = _buffers.get(run_id)
+    if buf is None:
+        buf = _buffers[run_id] = RunWriteBuffer(run_id)
+    return buf
+
+
+def buffer_proposal_update(run_id: str, patch: Dict[str, Any]) -> None:
+    _buffer(run_id).update_proposal(patch)
+
+
+def touch_run(run_id: Optional[str]) -> None:
+    """Buffer an updated_at bump. Nodes that only append decision rows would otherwise leave the
+    proposal looking idle, and the resume sweeper treats an idle run as orphaned."""
+    if run_id:
+        buffer_proposal_update(run_id, {"updated_at": datetime.now(timezone.utc)})
+
+
+def buffer_agent_decision(
+    run_id: str,
+    facility_id: str,
+    agent_name: str,
+    input_summary: str,
+    output_json: Dict[str, Any],
+    confidence: str,
+    rationale: str,
+) -> None:
+    _buffer(run_id).append_decision(
+        {
+            "run_id": run_id,
+            "facility_id": facility_id,
+            "agent_name": agent_name,
+            "input_summary": input_summary,
+            "output_json": output_json,
+            "confidence": confidence,
+            "rationale": rationale,
+            "timestamp": datetime.now(timezone.utc),
+        }
+    )
+
+
+def schedule_flush(run_id: Optional[str]) -> None:
+    """Commit buffered writes for run_id in the background (node boundary)."""
+    buf = _buffers.get(run_id) if run_id else None
+    if buf is None or buf.is_empty():
+        return
+    task = asyncio.create_task(buf.flush())
+    tasks = _inflight.setdefault(run_id, set())
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+
+async def flush_run_writes(run_id: Optional[str], final: bool = False) -> None:
+    """Wait for background flushes, then commit anything still buffered.
+    final=True also drops the run's buffer (run end), losing whatever a failed flush left in it."""
+    if not run_id:
+        return
+    buf = _buffers.get(run_id)
+    if buf is None:
+        return
+    try:
+        errors = []
+        tasks = list(_inflight.get(run_id, ()))
+        if tasks:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            errors = [r for r in results if isinstance(r, Exception)]
+        # Retries anything a failed background flush put back
+        await buf.flush()
+        if errors:
+            print(f"Write buffer for {run_id}: {len(errors)} background flush(es) failed and were retried: {errors[0]}")
+    finally:
+        if final:
+            if not buf.is_empty():
+                print(
+                    f"Write buffer for {run_id}: final flush failed, dropping "
+                    f"{len(buf.proposal_patch)} proposal field(s) and {len(buf.decisions)} decision row(s)"
+                )
+            _buffers.pop(run_id, None)
+            _inflight.pop(run_id, None)
@@ -1,8 +1,65 @@
 const API_BASE = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000';
 
+const MAX_RECONNECTS = 3;
+
+/**
+ * Reads SSE frames from a fetch response, calling onFrame({ id, data }) for each
+ * data frame. Heartbeat comments are skipped. Throws if the stream breaks.
+ */
+async function readFrames(response, onFrame) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  const handle = (part) => {
+    let id = null;
+    let dataStr = '';
+    for (const line of part.split('\n')) {
+      if (line.startsWith('id: ')) {
+        id = line.slice(4);
+      } else if (line.startsWith('data: ')) {
+        dataStr += line.slice(6);
+      }
+    }
+    if (dataStr) {
+      try {
+        onFrame({ id, data: JSON.parse(dataStr) });
+      } catch {
+        // malformed JSON chunk — skip
+      }
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    const parts = buffer.split('\n\n');
+    buffer = parts.pop() || '';
+    parts.forEach(handle);
+  }
+
+  // flush remaining buffer
+  if (buffer.trim()) handle(buffer);
+}
+
+/**
+ * GET /runs/{runId}/events — follow a run (e.g. one started in another tab).
+ * Pass lastEventId to replay only what came after it.
+ */
+export function openRunEvents({ runId, token, lastEventId }) {
+  const headers = { Authorization: `Bearer ${token}` };
+  if (lastEventId) headers['Last-Event-ID'] = lastEventId;
+  return fetch(`${API_BASE}/runs/${runId}/events`, { headers });
+}
+
 /**
  * Streams SSE events from POST /run using fetch + ReadableStream.
  * Cannot use EventSource because the endpoint requires POST.
+ * If the connection drops mid-run, reconnects to /runs/{runId}/events with
+ * Last-Event-ID so no stage events are lost or repeated.
  */
 export async function streamRun({ facilityId, token, humanFeedback, onEvent, onError, onDone }) {
   const bodyPayload = { facility_id: facilityId };
@@ -23,69 +80,44 @@ export async function streamRun({ facilityId, token, humanFeedback, onEvent, onE
     return;
   }
 
-  if (!response.ok) {
-    const text = await response.text().catch(() => 'Unknown error');
-    onError?.(`HTTP ${response.status}: ${text}`);
-    return;
-  }
+  let runId = null;
+  let lastEventId = null;
+  let finished = false;
+  const onFrame = ({ id, data }) => {
+    if (id) lastEventId = id;
+    if (data.run_id) runId = data.run_id;
+    if (data.stage === 'finished' || data.stage === 'error') finished = true;
+    onEvent?.(data);
+  };
 
-  if (!response.body) {
-    onError?.('No response body');
-    return;
-  }
+  for (let attempt = 0; ; attempt++) {
+    if (!response.ok) {
+      const text = await response.text().catch(() => 'Unknown error');
+      onError?.(`HTTP ${response.status}: ${text}`);
+      return;
+    }
 
-  const reader = response.body.getReader();
-  const decoder = new TextDecoder();
-  let buffer = '';
+    if (!response.body) {
+      onError?.('No response body');
+      return;
+    }
 
-  try {
-    while (true) {
-      const { done, value } = await reader.read();
-      if (done) break;
-
-      buffer += decoder.decode(value, { stream: true });
-
-      const parts = buffer.split('\n\n');
-      buffer = parts.pop() || '';
-
-      for (const part of parts) {
-        const lines = part.split('\n');
-        let dataStr = '';
-        for (const line of lines) {
-          if (line.startsWith('data: ')) {
-            dataStr += line.slice(6);
-          }
-        }
-        if (dataStr) {
-          try {
-            onEvent?.(JSON.parse(dataStr));
-          } catch {
-            // malformed JSON chunk — skip
-          }
-        }
+    try {
+      await readFrames(response, onFrame);
+      break;
+    } catch (err) {
+      if (finished || !runId || attempt >= MAX_RECONNECTS) {
+        onError?.(err.message || 'Stream read error');
+        return;
       }
     }
 
-    // flush remaining buffer
-    if (buffer.trim()) {
-      const lines = buffer.split('\n');
-      let dataStr = '';
-      for (const line of lines) {
-        if (line.startsWith('data: ')) {
-          dataStr += line.slice(6);
-        }
-      }
-      if (dataStr) {
-        try {
-          onEvent?.(JSON.parse(dataStr));
-        } catch {
-          // malformed final chunk
-        }
-      }
+    try {
+      response = await openRunEvents({ runId, token, lastEventId });
+    } catch (err) {
+      onError?.(err.message || 'Network error');
+      return;
     }
-  } catch (err) {
-    onError?.(err.message || 'Stream read error');
-    return;
   }
 
   onDone?.();